@@ -1,16 +1,24 @@
 # agents/metadata_extractor.py - COMPREHENSIVE EXTRACTION
 
 import json
+import math
 import asyncio
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import uuid
 import re
+from itertools import chain, count
 
 from anthropic import Anthropic
 import openai
 from loguru import logger
 import streamlit as st
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 from models.abstract_metadata import (
     ComprehensiveAbstractMetadata, StudyIdentification, StudyDesign,
@@ -21,6 +29,89 @@ from models.abstract_metadata import (
 from config.settings import settings
 
 
+# Sum of all clinical significance component weights (efficacy + safety + size)
+_CLINICAL_SIGNIFICANCE_MAX_SCORE = 1.3
+
+# Integer or decimal numbers counted by the source richness score
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+# Cheap unique ids for error metadata (uuid4 reads os.urandom per call): a
+# random per-process prefix, so ids do not repeat across runs that reuse a
+# PID (e.g. PID 1 in containers), plus a counter
+_ERROR_ID_COUNTER = count()
+_ERROR_ID_PREFIX = uuid.uuid4().hex[:8]
+
+# Minimal structure returned for failed extractions. Built once at import so
+# error bursts skip field validation (see _create_error_metadata).
+_ERROR_METADATA_TEMPLATE = ComprehensiveAbstractMetadata(
+    abstract_id="",
+    study_identification=StudyIdentification(title="Error in extraction", confidence_score=0.0),
+    study_design=StudyDesign(study_type=StudyType.PHASE_2, confidence_score=0.0),
+    patient_demographics=PatientDemographics(confidence_score=0.0),
+    disease_characteristics=DiseaseCharacteristics(mm_subtype=[MMSubtype.RRMM], confidence_score=0.0),
+    treatment_history=TreatmentHistory(confidence_score=0.0),
+    treatment_regimens=[TreatmentRegimen(regimen_name="Unknown", drugs=[], confidence_score=0.0)],
+    efficacy_outcomes=EfficacyOutcomes(confidence_score=0.0),
+    safety_profile=SafetyProfile(confidence_score=0.0),
+    statistical_analysis=StatisticalAnalysis(confidence_score=0.0),
+    extraction_confidence=0.0,
+    data_completeness_score=0.0,
+    clinical_significance_score=0.0
+)
+
+
+def _safety_events_from_entry(key: str, value: Any):
+    """Expand one entry of a free-form safety dict into event records"""
+    if isinstance(value, (int, float)):
+        return ({"event": key, "percentage": value},)
+    if isinstance(value, dict):
+        # Nested data like {'BVd': 79, 'DVd': 29}
+        return (
+            {"event": f"{key}_{subkey}", "percentage": subval}
+            for subkey, subval in value.items() if isinstance(subval, (int, float))
+        )
+    if isinstance(value, str):
+        # String values might be event names without percentages
+        return ({"event": value, "percentage": None},)
+    return ()
+
+
+def _make_section_builder(model_cls):
+    """Generate a straight-line ``build(data, confidence)`` for a flat section model
+    
+    The source is generated from ``model_fields`` at import, so every field is
+    read with an inlined ``data.get`` and the builder stays in sync with schema
+    edits. Only for models whose fields (besides confidence_score) all default
+    to None, so a missing key and an explicit null are equivalent. Instances
+    are still validated by the model constructor.
+    """
+    fields = [name for name in model_cls.model_fields if name != "confidence_score"]
+    non_null_defaults = [
+        name for name in fields
+        if model_cls.model_fields[name].is_required() or model_cls.model_fields[name].default is not None
+    ]
+    if non_null_defaults:
+        raise ValueError(f"{model_cls.__name__} has non-null defaults: {non_null_defaults}")
+    
+    arguments = "".join(f"        {name}=data.get({name!r}),\n" for name in fields)
+    source = (
+        "def build(data, confidence):\n"
+        "    return model_cls(\n"
+        f"{arguments}"
+        "        confidence_score=confidence\n"
+        "    )\n"
+    )
+    namespace = {"model_cls": model_cls}
+    exec(compile(source, f"<{model_cls.__name__} builder>", "exec"), namespace)
+    return namespace["build"]
+
+
+_BUILD_PATIENT_DEMOGRAPHICS = _make_section_builder(PatientDemographics)
+_BUILD_TREATMENT_HISTORY = _make_section_builder(TreatmentHistory)
+_BUILD_EFFICACY_OUTCOMES = _make_section_builder(EfficacyOutcomes)
+_BUILD_STATISTICAL_ANALYSIS = _make_section_builder(StatisticalAnalysis)
+
+
 class ExtractionValidator:
     """Validates and corrects extraction results"""
     
@@ -128,14 +219,8 @@ class EnhancedMetadataExtractor:
         logger.info("Starting comprehensive metadata extraction")
         
         try:
-            # Phase 1: Comprehensive extraction
-            raw_extraction = await self._extract_all_elements(abstract_text)
-            
-            # Phase 2: Validation and quality scoring
-            validated_data = self.validation_engine.validate_extraction(raw_extraction, abstract_text)
-            
-            # Phase 3: Confidence scoring
-            confidence_scores = self._calculate_confidence_scores(validated_data, abstract_text)
+            # Phases 1-3: Extraction, validation and confidence scoring
+            validated_data, confidence_scores = await self.extract_validated_data(abstract_text)
             
             # Phase 4: Structure into pydantic model
             structured_metadata = self._structure_metadata(validated_data, confidence_scores, abstract_text)
@@ -148,6 +233,24 @@ class EnhancedMetadataExtractor:
             # Return minimal structure with error information
             return self._create_error_metadata(abstract_text, str(e))
     
+    async def extract_validated_data(self, abstract_text: str) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Extract and validate raw metadata without building pydantic models
+        
+        Returns the validated extraction dict and its confidence scores. Used
+        directly by analytical sinks that never need the model tree.
+        """
+        
+        # Phase 1: Comprehensive extraction
+        raw_extraction = await self._extract_all_elements(abstract_text)
+        
+        # Phase 2: Validation and quality scoring
+        validated_data = self.validation_engine.validate_extraction(raw_extraction, abstract_text)
+        
+        # Phase 3: Confidence scoring
+        confidence_scores = self._calculate_confidence_scores(validated_data, abstract_text)
+        
+        return validated_data, confidence_scores
+    
     async def _extract_all_elements(self, abstract_text: str) -> Dict[str, Any]:
         """Extract comprehensive metadata using LLM"""
         
@@ -444,9 +547,18 @@ class EnhancedMetadataExtractor:
         
         abstract_id = str(uuid.uuid4())
         
+        # Bind lookups shared across sections once
+        vd_get = validated_data.get
+        cs_quality, cs_disease, cs_history, cs_efficacy, cs_safety, cs_qol, cs_stats = (
+            confidence_scores.get(key, 0.0) for key in (
+                "extraction_quality", "disease_characteristics", "treatment_history",
+                "efficacy_outcomes", "safety_profile", "quality_of_life", "statistical_analysis"
+            )
+        )
+        
         try:
             # Create individual components with safe data extraction
-            study_id_data = validated_data.get("study_identification", {})
+            study_id_data = vd_get("study_identification", {})
             study_id = StudyIdentification(
                 title=study_id_data.get("title", "Unknown Study"),
                 study_acronym=study_id_data.get("study_acronym"),
@@ -456,11 +568,11 @@ class EnhancedMetadataExtractor:
                 principal_investigator=study_id_data.get("principal_investigator"),
                 publication_year=study_id_data.get("publication_year"),
                 conference_name=study_id_data.get("conference_name"),
-                confidence_score=study_id_data.get("confidence_score", confidence_scores.get("extraction_quality", 0.0))
+                confidence_score=study_id_data.get("confidence_score", cs_quality)
             )
             
             # Build study design with safe defaults
-            study_design_data = validated_data.get("study_design", {})
+            study_design_data = vd_get("study_design", {})
             study_design = StudyDesign(
                 study_type=StudyType.get_or_create(study_design_data.get("study_type", "Phase 2")),
                 trial_phase=study_design_data.get("trial_phase"),
@@ -479,40 +591,23 @@ class EnhancedMetadataExtractor:
                 primary_endpoints=study_design_data.get("primary_endpoints", []),
                 secondary_endpoints=study_design_data.get("secondary_endpoints", []),
                 exploratory_endpoints=study_design_data.get("exploratory_endpoints", []),
-                confidence_score=study_design_data.get("confidence_score", confidence_scores.get("extraction_quality", 0.0))
+                confidence_score=study_design_data.get("confidence_score", cs_quality)
             )
             
             # Build patient demographics with safe handling
-            demographics_data = validated_data.get("patient_demographics", {})
+            demographics_data = vd_get("patient_demographics", {})
             
             # Handle case where LLM only returned confidence_score or minimal data
             if len(demographics_data) <= 1 and "confidence_score" in demographics_data:
                 # LLM couldn't extract meaningful demographics, use empty structure
                 demographics_data = {"confidence_score": demographics_data.get("confidence_score", 0.0)}
             
-            patient_demographics = PatientDemographics(
-                total_enrolled=demographics_data.get("total_enrolled"),
-                evaluable_patients=demographics_data.get("evaluable_patients"),
-                safety_population=demographics_data.get("safety_population"),
-                itt_population=demographics_data.get("itt_population"),
-                median_age=demographics_data.get("median_age"),
-                mean_age=demographics_data.get("mean_age"),
-                age_range=demographics_data.get("age_range"),
-                elderly_percentage=demographics_data.get("elderly_percentage"),
-                very_elderly_percentage=demographics_data.get("very_elderly_percentage"),
-                male_percentage=demographics_data.get("male_percentage"),
-                female_percentage=demographics_data.get("female_percentage"),
-                race_distribution=demographics_data.get("race_distribution"),
-                ecog_0_percentage=demographics_data.get("ecog_0_percentage"),
-                ecog_1_percentage=demographics_data.get("ecog_1_percentage"),
-                ecog_2_plus_percentage=demographics_data.get("ecog_2_plus_percentage"),
-                karnofsky_median=demographics_data.get("karnofsky_median"),
-                frailty_score_high=demographics_data.get("frailty_score_high"),
-                confidence_score=demographics_data.get("confidence_score", 0.0)
+            patient_demographics = _BUILD_PATIENT_DEMOGRAPHICS(
+                demographics_data, demographics_data.get("confidence_score", 0.0)
             )
             
             # Build disease characteristics with safe handling
-            disease_data = validated_data.get("disease_characteristics", {})
+            disease_data = vd_get("disease_characteristics", {})
             mm_subtypes = []
             if disease_data.get("mm_subtype"):
                 if isinstance(disease_data["mm_subtype"], list):
@@ -539,37 +634,18 @@ class EnhancedMetadataExtractor:
                 albumin_low_percentage=disease_data.get("albumin_low_percentage"),
                 renal_impairment_percentage=disease_data.get("renal_impairment_percentage"),
                 biomarker_results=disease_data.get("biomarker_results"),
-                confidence_score=disease_data.get("confidence_score", confidence_scores.get("disease_characteristics", 0.0))
+                confidence_score=disease_data.get("confidence_score", cs_disease)
             )
             
             # Build treatment history with safe handling
-            treatment_hist_data = validated_data.get("treatment_history", {})
-            treatment_history = TreatmentHistory(
-                line_of_therapy=treatment_hist_data.get("line_of_therapy"),
-                treatment_setting=treatment_hist_data.get("treatment_setting"),
-                median_prior_therapies=treatment_hist_data.get("median_prior_therapies"),
-                prior_therapy_range=treatment_hist_data.get("prior_therapy_range"),
-                heavily_pretreated_percentage=treatment_hist_data.get("heavily_pretreated_percentage"),
-                prior_therapies=treatment_hist_data.get("prior_therapies"),
-                lenalidomide_exposed_percentage=treatment_hist_data.get("lenalidomide_exposed_percentage"),
-                lenalidomide_refractory_percentage=treatment_hist_data.get("lenalidomide_refractory_percentage"),
-                pomalidomide_exposed_percentage=treatment_hist_data.get("pomalidomide_exposed_percentage"),
-                bortezomib_exposed_percentage=treatment_hist_data.get("bortezomib_exposed_percentage"),
-                carfilzomib_exposed_percentage=treatment_hist_data.get("carfilzomib_exposed_percentage"),
-                daratumumab_exposed_percentage=treatment_hist_data.get("daratumumab_exposed_percentage"),
-                daratumumab_refractory_percentage=treatment_hist_data.get("daratumumab_refractory_percentage"),
-                prior_autologous_sct_percentage=treatment_hist_data.get("prior_autologous_sct_percentage"),
-                prior_allogeneic_sct_percentage=treatment_hist_data.get("prior_allogeneic_sct_percentage"),
-                double_refractory_percentage=treatment_hist_data.get("double_refractory_percentage"),
-                triple_refractory_percentage=treatment_hist_data.get("triple_refractory_percentage"),
-                penta_refractory_percentage=treatment_hist_data.get("penta_refractory_percentage"),
-                time_since_diagnosis_median=treatment_hist_data.get("time_since_diagnosis_median"),
-                time_since_last_therapy_median=treatment_hist_data.get("time_since_last_therapy_median"),
-                confidence_score=treatment_hist_data.get("confidence_score", confidence_scores.get("treatment_history", 0.0))
+            treatment_hist_data = vd_get("treatment_history", {})
+            treatment_history = _BUILD_TREATMENT_HISTORY(
+                treatment_hist_data,
+                treatment_hist_data.get("confidence_score", cs_history)
             )
             
             # Build treatment regimens with safe handling
-            regimens_data = validated_data.get("treatment_regimens", [])
+            regimens_data = vd_get("treatment_regimens", [])
             treatment_regimens = []
             
             for regimen_data in regimens_data:
@@ -602,31 +678,14 @@ class EnhancedMetadataExtractor:
                 )]
             
             # Build efficacy outcomes with safe handling
-            efficacy_data = validated_data.get("efficacy_outcomes", {})
-            efficacy_outcomes = EfficacyOutcomes(
-                overall_response_rate=efficacy_data.get("overall_response_rate"),
-                complete_response_rate=efficacy_data.get("complete_response_rate"),
-                very_good_partial_response_rate=efficacy_data.get("very_good_partial_response_rate"),
-                partial_response_rate=efficacy_data.get("partial_response_rate"),
-                stable_disease_rate=efficacy_data.get("stable_disease_rate"),
-                progressive_disease_rate=efficacy_data.get("progressive_disease_rate"),
-                clinical_benefit_rate=efficacy_data.get("clinical_benefit_rate"),
-                progression_free_survival=efficacy_data.get("progression_free_survival"),
-                overall_survival=efficacy_data.get("overall_survival"),
-                event_free_survival=efficacy_data.get("event_free_survival"),
-                time_to_next_treatment=efficacy_data.get("time_to_next_treatment"),
-                time_to_response=efficacy_data.get("time_to_response"),
-                duration_of_response=efficacy_data.get("duration_of_response"),
-                time_to_progression=efficacy_data.get("time_to_progression"),
-                mrd_negative_rate=efficacy_data.get("mrd_negative_rate"),
-                mrd_method=efficacy_data.get("mrd_method"),
-                stringent_cr_rate=efficacy_data.get("stringent_cr_rate"),
-                subgroup_analyses=efficacy_data.get("subgroup_analyses"),
-                confidence_score=efficacy_data.get("confidence_score", confidence_scores.get("efficacy_outcomes", 0.0))
+            efficacy_data = vd_get("efficacy_outcomes", {})
+            efficacy_outcomes = _BUILD_EFFICACY_OUTCOMES(
+                efficacy_data,
+                efficacy_data.get("confidence_score", cs_efficacy)
             )
             
             # Build safety profile with safe handling and validation
-            safety_data = validated_data.get("safety_profile", {})
+            safety_data = vd_get("safety_profile", {})
             
             # Debug logging for safety data format issues
             if safety_data:
@@ -659,21 +718,10 @@ class EnhancedMetadataExtractor:
                             return [{"event": "unspecified", "percentage": data['percentage']}]
                         else:
                             # Complex nested dict - extract what we can
-                            events = []
-                            for key, value in data.items():
-                                if key == 'percentage' and isinstance(value, (int, float)):
-                                    # Skip percentage-only entries, handle above
-                                    continue
-                                elif isinstance(value, (int, float)):
-                                    events.append({"event": key, "percentage": value})
-                                elif isinstance(value, dict):
-                                    # Nested data like {'BVd': 79, 'DVd': 29}
-                                    for subkey, subval in value.items():
-                                        if isinstance(subval, (int, float)):
-                                            events.append({"event": f"{key}_{subkey}", "percentage": subval})
-                                elif isinstance(value, str) and key != 'confidence_score':
-                                    # String values might be event names without percentages
-                                    events.append({"event": value, "percentage": None})
+                            events = list(chain.from_iterable(
+                                _safety_events_from_entry(key, value)
+                                for key, value in data.items() if key != 'confidence_score'
+                            ))
                             return events if events else None
                     else:
                         return None
@@ -701,7 +749,7 @@ class EnhancedMetadataExtractor:
                     discontinuations=safety_data.get("discontinuations"),
                     treatment_related_deaths=safety_data.get("treatment_related_deaths"),
                     total_deaths=safety_data.get("total_deaths"),
-                    confidence_score=safety_data.get("confidence_score", confidence_scores.get("safety_profile", 0.0))
+                    confidence_score=safety_data.get("confidence_score", cs_safety)
                 )
             except Exception as e:
                 logger.warning(f"Error creating SafetyProfile, using minimal version: {e}")
@@ -712,7 +760,7 @@ class EnhancedMetadataExtractor:
                 )
             
             # Build quality of life (optional)
-            qol_data = validated_data.get("quality_of_life", {})
+            qol_data = vd_get("quality_of_life", {})
             quality_of_life = None
             if qol_data:
                 quality_of_life = QualityOfLife(
@@ -721,21 +769,13 @@ class EnhancedMetadataExtractor:
                     qol_improvement_rate=qol_data.get("qol_improvement_rate"),
                     symptom_relief_rate=qol_data.get("symptom_relief_rate"),
                     time_to_qol_improvement=qol_data.get("time_to_qol_improvement"),
-                    confidence_score=confidence_scores.get("quality_of_life", 0.0)
+                    confidence_score=cs_qol
                 )
             
             # Build statistical analysis
-            stats_data = validated_data.get("statistical_analysis", {})
-            statistical_analysis = StatisticalAnalysis(
-                primary_analysis_method=stats_data.get("primary_analysis_method"),
-                significance_level=stats_data.get("significance_level"),
-                power_calculation=stats_data.get("power_calculation"),
-                sample_size_rationale=stats_data.get("sample_size_rationale"),
-                survival_analysis_method=stats_data.get("survival_analysis_method"),
-                censoring_details=stats_data.get("censoring_details"),
-                hazard_ratios=stats_data.get("hazard_ratios"),
-                p_values=stats_data.get("p_values"),
-                confidence_score=confidence_scores.get("statistical_analysis", 0.0)
+            stats_data = vd_get("statistical_analysis", {})
+            statistical_analysis = _BUILD_STATISTICAL_ANALYSIS(
+                stats_data, cs_stats
             )
             
             # Calculate overall scores using new confidence metrics
@@ -744,7 +784,9 @@ class EnhancedMetadataExtractor:
             source_richness = confidence_scores.get('source_richness', 0.0)
             overall_confidence = confidence_scores.get('overall_confidence', extraction_quality)
             
-            clinical_significance = self._calculate_clinical_significance(validated_data)
+            clinical_significance = confidence_scores.get('clinical_significance')
+            if clinical_significance is None:
+                clinical_significance = self._calculate_clinical_significance(validated_data)
             
             # Create comprehensive metadata
             metadata = ComprehensiveAbstractMetadata(
@@ -789,14 +831,17 @@ class EnhancedMetadataExtractor:
             Dictionary with different confidence metrics
         """
         
-        # 1. EXTRACTION QUALITY CONFIDENCE
-        # Based on how confident we are about the data we DID extract
-        extraction_quality = self._calculate_extraction_quality_confidence(extracted_data)
-        
-        # 2. DATA COMPLETENESS SCORE  
+        # 1. DATA COMPLETENESS SCORE  
         # Based on how much expected data was found (not a confidence per se)
         data_completeness = self._calculate_data_completeness_score(extracted_data, source_text)
         
+        # 2. EXTRACTION QUALITY CONFIDENCE
+        # Based on how confident we are about the data we DID extract
+        clinical_significance = self._calculate_clinical_significance(extracted_data)
+        extraction_quality = self._calculate_extraction_quality_confidence(
+            extracted_data, data_completeness, clinical_significance
+        )
+        
         # 3. SOURCE RICHNESS SCORE
         # Based on how much extractable information the source contains
         source_richness = self._calculate_source_richness_score(source_text)
@@ -813,31 +858,31 @@ class EnhancedMetadataExtractor:
             'extraction_quality': extraction_quality,    # How confident are we in extracted values?
             'data_completeness': data_completeness,      # How much expected data was found?
             'source_richness': source_richness,          # How rich was the source text?
-            'overall_confidence': overall_confidence     # Combined metric
+            'overall_confidence': overall_confidence,    # Combined metric
+            'clinical_significance': clinical_significance  # Reused when structuring
         }
     
-    def _calculate_extraction_quality_confidence(self, extracted_data: Dict[str, Any]) -> float:
-        """Calculate overall extraction quality confidence"""
-        
-        # Reduced thresholds for confidence scoring
-        quality_scores = []
+    def _calculate_extraction_quality_confidence(self, extracted_data: Dict[str, Any],
+                                                 data_completeness: Optional[float] = None,
+                                                 clinical_significance: Optional[float] = None) -> float:
+        """Calculate overall extraction quality confidence
         
-        # Basic structure validation (reduced threshold)
-        if extracted_data.get('study_identification'):
-            quality_scores.append(0.8)  # Reduced from 0.9
-        
-        # Data completeness (reduced threshold)
-        completeness = self._calculate_data_completeness_score(extracted_data, "")
-        quality_scores.append(completeness * 0.8)  # Reduced weight
+        Callers that already scored completeness or significance for the same
+        data can pass them in to avoid recomputing.
+        """
+        if data_completeness is None:
+            data_completeness = self._calculate_data_completeness_score(extracted_data, "")
+        if clinical_significance is None:
+            clinical_significance = self._calculate_clinical_significance(extracted_data)
         
-        # Clinical significance (reduced threshold)
-        significance = self._calculate_clinical_significance(extracted_data)
-        quality_scores.append(significance * 0.7)  # Reduced weight
+        # Data completeness and clinical significance carry reduced weights
+        completeness = data_completeness * 0.8
+        significance = clinical_significance * 0.7
         
-        # Calculate weighted average with reduced thresholds
-        if quality_scores:
-            return sum(quality_scores) / len(quality_scores)
-        return 0.6  # Default to moderate confidence instead of 0.0
+        # Basic structure validation adds a third component (reduced from 0.9)
+        if extracted_data.get('study_identification'):
+            return (0.8 + completeness + significance) / 3
+        return (completeness + significance) / 2
     
     def _calculate_data_completeness_score(self, extracted_data: Dict[str, Any], source_text: str) -> float:
         """
@@ -892,11 +937,15 @@ class EnhancedMetadataExtractor:
         else:
             richness_indicators.append(0.5)
             
-        # Numerical data presence
-        numbers = re.findall(r'\d+(?:\.\d+)?', source_text)
-        if len(numbers) > 10:
+        # Numerical data presence - stop scanning once the top threshold is reached
+        number_count = 0
+        for _ in _NUMBER_RE.finditer(source_text):
+            number_count += 1
+            if number_count > 10:
+                break
+        if number_count > 10:
             richness_indicators.append(0.9)
-        elif len(numbers) > 5:
+        elif number_count > 5:
             richness_indicators.append(0.7)
         else:
             richness_indicators.append(0.5)
@@ -911,9 +960,8 @@ class EnhancedMetadataExtractor:
     def _calculate_clinical_significance(self, data: Dict[str, Any]) -> float:
         """Calculate clinical significance score based on key endpoints"""
         significance_score = 0.0
-        max_score = 0.0
         
-        # Check for key efficacy endpoints
+        # Check for key efficacy endpoints (max 1.0)
         efficacy = data.get("efficacy_outcomes", {})
         if efficacy.get("overall_response_rate"):
             significance_score += 0.3
@@ -921,59 +969,141 @@ class EnhancedMetadataExtractor:
             significance_score += 0.3
         if efficacy.get("overall_survival"):
             significance_score += 0.4
-        max_score += 1.0
         
-        # Check for safety data
+        # Check for safety data (max 0.2)
         safety = data.get("safety_profile", {})
         if safety.get("grade_3_4_aes"):
             significance_score += 0.2
-        max_score += 0.2
         
-        # Check for patient population size
+        # Check for patient population size (max 0.1)
         demographics = data.get("patient_demographics", {})
         if demographics.get("total_enrolled"):
             if demographics["total_enrolled"] >= 100:
                 significance_score += 0.1
             elif demographics["total_enrolled"] >= 50:
                 significance_score += 0.05
-        max_score += 0.1
         
-        return significance_score / max_score if max_score > 0 else 0.0
+        # Every component always contributes to the maximum: 1.0 + 0.2 + 0.1
+        return significance_score / _CLINICAL_SIGNIFICANCE_MAX_SCORE
     
     def _create_error_metadata(self, source_text: str, error_message: str) -> ComprehensiveAbstractMetadata:
         """Create minimal metadata structure for error cases"""
         
-        abstract_id = str(uuid.uuid4())
+        if settings.ASCOMIND_STRICT_UUID:
+            abstract_id = str(uuid.uuid4())
+        else:
+            abstract_id = f"err-{_ERROR_ID_PREFIX}-{next(_ERROR_ID_COUNTER)}"
         
-        # Create minimal required components
-        study_id = StudyIdentification(title="Error in extraction", confidence_score=0.0)
-        study_design = StudyDesign(study_type=StudyType.PHASE_2, confidence_score=0.0)
-        patient_demographics = PatientDemographics(confidence_score=0.0)
-        disease_characteristics = DiseaseCharacteristics(mm_subtype=[MMSubtype.RRMM], confidence_score=0.0)
-        treatment_history = TreatmentHistory(confidence_score=0.0)
-        treatment_regimens = [TreatmentRegimen(regimen_name="Unknown", drugs=[], confidence_score=0.0)]
-        efficacy_outcomes = EfficacyOutcomes(confidence_score=0.0)
-        safety_profile = SafetyProfile(confidence_score=0.0)
-        statistical_analysis = StatisticalAnalysis(confidence_score=0.0)
-        
-        return ComprehensiveAbstractMetadata(
-            abstract_id=abstract_id,
-            extraction_timestamp=datetime.now(),
-            study_identification=study_id,
-            study_design=study_design,
-            patient_demographics=patient_demographics,
-            disease_characteristics=disease_characteristics,
-            treatment_history=treatment_history,
-            treatment_regimens=treatment_regimens,
-            efficacy_outcomes=efficacy_outcomes,
-            safety_profile=safety_profile,
-            statistical_analysis=statistical_analysis,
-            extraction_confidence=0.0,
-            data_completeness_score=0.0,
-            clinical_significance_score=0.0,
-            source_text=source_text,
-            processing_notes=[f"Extraction error: {error_message}"]
-        )
+        # Deep copy: callers fill in sub-model fields on results (e.g. the
+        # publication year), which must not leak into the shared template
+        return _ERROR_METADATA_TEMPLATE.model_copy(deep=True, update={
+            "abstract_id": abstract_id,
+            "extraction_timestamp": datetime.now(),
+            "source_text": source_text,
+            "processing_notes": [f"Extraction error: {error_message}"]
+        })
+
+
+def _as_float(value: Any) -> Optional[float]:
+    """Coerce an extracted number, or a {'value'/'rate'/'median': n} dict, to float"""
+    if isinstance(value, dict):
+        value = next((value[k] for k in ('value', 'rate', 'median') if value.get(k) is not None), None)
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _as_int(value: Any) -> Optional[int]:
+    """Coerce an extracted count to int"""
+    number = _as_float(value)
+    return int(number) if number is not None else None
+
+
+def _as_bool(value: Any) -> Optional[bool]:
+    """Keep only genuine booleans from the LLM output"""
+    return value if isinstance(value, bool) else None
+
+
+def _as_str(value: Any) -> Optional[str]:
+    """Stringify an extracted value, keeping nulls"""
+    return str(value) if value is not None else None
+
+
+# Flat column layout of process_batch_to_arrow, one row per abstract
+ARROW_METADATA_SCHEMA = pa.schema([
+    ("title", pa.string()),
+    ("study_acronym", pa.string()),
+    ("nct_number", pa.string()),
+    ("study_group", pa.string()),
+    ("publication_year", pa.int64()),
+    ("conference_name", pa.string()),
+    ("study_type", pa.string()),
+    ("randomized", pa.bool_()),
+    ("multicenter", pa.bool_()),
+    ("number_of_arms", pa.int64()),
+    ("total_enrolled", pa.int64()),
+    ("median_age", pa.float64()),
+    ("male_percentage", pa.float64()),
+    ("line_of_therapy", pa.string()),
+    ("regimen_names", pa.list_(pa.string())),
+    ("overall_response_rate", pa.float64()),
+    ("complete_response_rate", pa.float64()),
+    ("pfs_median", pa.float64()),
+    ("os_median", pa.float64()),
+    ("grade_3_4_ae_count", pa.int64()),
+    ("discontinuation_rate", pa.float64()),
+    ("extraction_confidence", pa.float64()),
+    ("data_completeness_score", pa.float64()),
+    ("clinical_significance_score", pa.float64()),
+    ("extraction_error", pa.string()),
+]) if pa is not None else None
+
+
+def _flatten_for_arrow(data: Dict[str, Any], confidence_scores: Dict[str, float]) -> Dict[str, Any]:
+    """Flatten one validated extraction dict into an ARROW_METADATA_SCHEMA row"""
+    study_id = data.get("study_identification") or {}
+    design = data.get("study_design") or {}
+    demographics = data.get("patient_demographics") or {}
+    history = data.get("treatment_history") or {}
+    efficacy = data.get("efficacy_outcomes") or {}
+    safety = data.get("safety_profile") or {}
+    regimens = data.get("treatment_regimens") or []
+    grade_3_4 = safety.get("grade_3_4_aes")
+    
+    return {
+        "title": _as_str(study_id.get("title")),
+        "study_acronym": _as_str(study_id.get("study_acronym")),
+        "nct_number": _as_str(study_id.get("nct_number")),
+        "study_group": _as_str(study_id.get("study_group")),
+        "publication_year": _as_int(study_id.get("publication_year")),
+        "conference_name": _as_str(study_id.get("conference_name")),
+        "study_type": StudyType.get_or_create(design.get("study_type", "Phase 2")).value,
+        "randomized": _as_bool(design.get("randomized")),
+        "multicenter": _as_bool(design.get("multicenter")),
+        "number_of_arms": _as_int(design.get("number_of_arms")),
+        "total_enrolled": _as_int(demographics.get("total_enrolled")),
+        "median_age": _as_float(demographics.get("median_age")),
+        "male_percentage": _as_float(demographics.get("male_percentage")),
+        "line_of_therapy": _as_str(history.get("line_of_therapy")),
+        "regimen_names": [
+            str(regimen["regimen_name"]) for regimen in regimens
+            if isinstance(regimen, dict) and regimen.get("regimen_name")
+        ],
+        "overall_response_rate": _as_float(efficacy.get("overall_response_rate")),
+        "complete_response_rate": _as_float(efficacy.get("complete_response_rate")),
+        "pfs_median": _as_float(efficacy.get("progression_free_survival")),
+        "os_median": _as_float(efficacy.get("overall_survival")),
+        "grade_3_4_ae_count": len(grade_3_4) if isinstance(grade_3_4, list) else None,
+        "discontinuation_rate": _as_float(safety.get("discontinuations")),
+        "extraction_confidence": confidence_scores.get("overall_confidence"),
+        "data_completeness_score": confidence_scores.get("data_completeness"),
+        "clinical_significance_score": confidence_scores.get("clinical_significance"),
+        "extraction_error": None,
+    }
 
 
 # Batch processing functionality
@@ -983,27 +1113,76 @@ class BatchExtractor:
     def __init__(self):
         self.extractor = EnhancedMetadataExtractor()
     
+    async def _run_bounded(self, worker, abstract_texts: List[str], limit: int) -> List[Any]:
+        """Run worker over all abstracts with at most ``limit`` calls in flight"""
+        semaphore = asyncio.Semaphore(limit)
+        
+        async def _one(text: str):
+            async with semaphore:
+                return await worker(text)
+        
+        return await asyncio.gather(*[_one(text) for text in abstract_texts], return_exceptions=True)
+    
     async def process_batch(self, abstract_texts: List[str], batch_size: int = None) -> List[ComprehensiveAbstractMetadata]:
-        """Process multiple abstracts in batches"""
+        """Process multiple abstracts concurrently
+        
+        All abstracts are scheduled in a single task pool. ``batch_size`` no
+        longer splits the input into sequential batches; it caps how many
+        extractions are in flight at once, so a slow call never holds back
+        the abstracts queued behind it. Results keep the input order.
+        """
         
         batch_size = batch_size or settings.BATCH_SIZE
+        batch_results = await self._run_bounded(
+            self.extractor.extract_comprehensive_metadata, abstract_texts, batch_size
+        )
+        
+        # Handle results and exceptions
         results = []
+        for result in batch_results:
+            if isinstance(result, Exception):
+                logger.error(f"Batch processing error: {result}")
+                # Create error metadata
+                error_metadata = self.extractor._create_error_metadata("", str(result))
+                results.append(error_metadata)
+            else:
+                results.append(result)
         
-        for i in range(0, len(abstract_texts), batch_size):
-            batch = abstract_texts[i:i + batch_size]
-            
-            # Process batch concurrently
-            tasks = [self.extractor.extract_comprehensive_metadata(text) for text in batch]
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Handle results and exceptions
-            for result in batch_results:
-                if isinstance(result, Exception):
-                    logger.error(f"Batch processing error: {result}")
-                    # Create error metadata
-                    error_metadata = self.extractor._create_error_metadata("", str(result))
-                    results.append(error_metadata)
-                else:
-                    results.append(result)
+        return results
+    
+    async def process_batch_to_arrow(self, abstract_texts: List[str], batch_size: int = None,
+                                     output_path: Optional[str] = None) -> "pa.Table":
+        """Process abstracts straight into a flat Arrow table
+        
+        Skips ComprehensiveAbstractMetadata entirely and builds columns from the
+        validated extraction dicts, for analytics and search warehouses. Keep
+        process_batch for API responses. If output_path is given the table is
+        also written there as Parquet.
+        """
+        if pa is None:
+            raise ImportError("pyarrow not available. Install with: pip install pyarrow")
+        
+        batch_size = batch_size or settings.BATCH_SIZE
+        batch_results = await self._run_bounded(
+            self.extractor.extract_validated_data, abstract_texts, batch_size
+        )
+        
+        columns: Dict[str, List[Any]] = {field.name: [] for field in ARROW_METADATA_SCHEMA}
+        for result in batch_results:
+            if isinstance(result, Exception):
+                logger.error(f"Batch processing error: {result}")
+                row = {"extraction_error": str(result)}
+            else:
+                validated_data, confidence_scores = result
+                try:
+                    row = _flatten_for_arrow(validated_data, confidence_scores)
+                except Exception as e:
+                    logger.error(f"Arrow flattening error: {e}")
+                    row = {"extraction_error": str(e)}
+            for name, values in columns.items():
+                values.append(row.get(name))
         
-        return results 
\ No newline at end of file
+        table = pa.Table.from_pydict(columns, schema=ARROW_METADATA_SCHEMA)
+        if output_path:
+            pq.write_table(table, output_path)
+        return table
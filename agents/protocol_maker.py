@@ -1,13 +1,32 @@
 # agents/protocol_maker.py - INTELLIGENT PROTOCOL GENERATION
 
 import asyncio
-from typing import Dict, List, Any, Optional
+import copy
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Tuple, Union
 from datetime import datetime
 import json
+import orjson
 from enum import Enum
 from loguru import logger
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+import httpx
 import streamlit as st
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+import numpy as np
+try:
+    import faiss
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    faiss = None
+    SentenceTransformer = None
 
 from config.settings import settings
 
@@ -31,6 +50,329 @@ class AnalysisComplexity(Enum):
     EXPERT = "Expert"
 
 
+class ProtocolRecommendation(BaseModel):
+    """Protocol type recommendation emitted by Claude"""
+    model_config = ConfigDict(use_enum_values=True)
+    
+    recommended_protocol_type: ProtocolType
+    complexity_level: AnalysisComplexity
+    primary_endpoints: List[str] = Field(description="Primary endpoints to focus on")
+    secondary_endpoints: List[str] = Field(description="Secondary endpoints")
+    statistical_methods: List[str] = Field(description="Recommended statistical approaches")
+    potential_challenges: List[str] = Field(description="Identified analysis challenges")
+    data_requirements: List[str] = Field(description="Specific data requirements")
+    confidence_score: float = Field(ge=0.0, le=1.0)
+    reasoning: str = Field(description="Detailed explanation of recommendations")
+
+
+class ProtocolStep(BaseModel):
+    """Single step of a detailed analysis protocol"""
+    step: str
+    rationale: str
+    acceptance_criteria: List[str]
+
+
+class DetailedProtocol(BaseModel):
+    """Step-by-step analysis protocol emitted by Claude"""
+    data_preparation: List[ProtocolStep]
+    quality_assessment: List[ProtocolStep]
+    statistical_analysis_workflow: List[ProtocolStep]
+    interpretation_guidelines: List[ProtocolStep]
+    reporting_standards: List[ProtocolStep]
+
+
+PROTOCOL_MODEL = "claude-3-5-sonnet-20241022"
+DETAIL_MODEL = "claude-3-5-haiku-latest"
+
+# Forced tool calls constrain Claude's output to these schemas
+PROTOCOL_RECOMMENDATION_TOOL = {
+    "name": "emit_protocol_recommendation",
+    "description": "Record the recommended analysis protocol type and scope",
+    "input_schema": ProtocolRecommendation.model_json_schema()
+}
+DETAILED_PROTOCOL_TOOL = {
+    "name": "emit_detailed_protocol",
+    "description": "Record the detailed step-by-step analysis protocol",
+    "input_schema": DetailedProtocol.model_json_schema()
+}
+
+# Exact-match LLM response cache shared by all ProtocolMaker instances
+RESPONSE_CACHE_DIR = settings.DATA_DIR / "cache" / "protocol_responses"
+RESPONSE_CACHE_MAX_ENTRIES = 128
+MESSAGE_BATCH_POLL_SECONDS = 20
+DETAILED_PROTOCOL_TTL_SECONDS = 24 * 60 * 60
+SPECULATIVE_PREFETCH_MIN_CONFIDENCE = 0.8
+SMALL_INPUT_STUDY_THRESHOLD = 10
+_response_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _get_cached_response(cache_key: str) -> Optional[Dict[str, Any]]:
+    """Look up a cached response in memory, then on disk
+    
+    Returns a copy, so callers may mutate it without touching the cache.
+    """
+    if cache_key in _response_cache:
+        _response_cache.move_to_end(cache_key)
+        return copy.deepcopy(_response_cache[cache_key])
+    
+    cache_file = RESPONSE_CACHE_DIR / f"{cache_key}.json"
+    try:
+        response = json.loads(cache_file.read_text())['response']
+    except (OSError, ValueError, KeyError):
+        return None
+    
+    _remember_response(cache_key, copy.deepcopy(response))
+    return response
+
+
+def _store_cached_response(cache_key: str, response: Dict[str, Any]) -> None:
+    """Cache a copy of a response in memory and persist it to disk"""
+    _remember_response(cache_key, copy.deepcopy(response))
+    try:
+        RESPONSE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (RESPONSE_CACHE_DIR / f"{cache_key}.json").write_text(json.dumps({
+            'created_at': datetime.now().isoformat(),
+            'response': response
+        }))
+    except OSError as e:
+        logger.warning(f"Could not persist protocol response cache entry: {e}")
+
+
+def _remember_response(cache_key: str, response: Dict[str, Any]) -> None:
+    """Insert into the in-memory LRU, evicting the oldest entries"""
+    _response_cache[cache_key] = response
+    _response_cache.move_to_end(cache_key)
+    while len(_response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+
+
+class SemanticRecommendationCache:
+    """Nearest-neighbour cache of protocol recommendations
+    
+    Study-set fingerprints are embedded with a small local sentence model and
+    matched by cosine similarity in a FAISS inner-product index, so minor edits
+    to the study list still hit. The index and responses persist to disk.
+    """
+    
+    def __init__(self, cache_dir: Path, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 similarity_threshold: float = 0.97):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.similarity_threshold = similarity_threshold
+        self.enabled = faiss is not None and SentenceTransformer is not None
+        self._model = None
+        self._index = None
+        self._responses: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+    
+    def lookup(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return the cached recommendation closest to fingerprint, if similar enough"""
+        if not self.enabled:
+            return None
+        
+        try:
+            with self._lock:
+                self._load()
+                if self._index.ntotal == 0:
+                    return None
+                scores, ids = self._index.search(self._embed(fingerprint), 1)
+                if scores[0][0] < self.similarity_threshold:
+                    return None
+                return copy.deepcopy(self._responses[ids[0][0]])
+        except Exception as e:
+            logger.warning(f"Semantic protocol cache disabled after lookup error: {e}")
+            self.enabled = False
+            return None
+    
+    def add(self, fingerprint: str, recommendation: Dict[str, Any]) -> None:
+        """Store a recommendation under fingerprint and persist the index"""
+        if not self.enabled:
+            return
+        
+        try:
+            with self._lock:
+                self._load()
+                self._index.add(self._embed(fingerprint))
+                self._responses.append(copy.deepcopy(recommendation))
+                
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                faiss.write_index(self._index, str(self.cache_dir / "index.faiss"))
+                (self.cache_dir / "responses.json").write_text(json.dumps(self._responses))
+        except Exception as e:
+            logger.warning(f"Semantic protocol cache disabled after store error: {e}")
+            self.enabled = False
+    
+    def _load(self) -> None:
+        """Load the embedding model and any persisted index on first use"""
+        if self._model is not None:
+            return
+        
+        self._model = SentenceTransformer(self.model_name)
+        index_file = self.cache_dir / "index.faiss"
+        responses_file = self.cache_dir / "responses.json"
+        if index_file.exists() and responses_file.exists():
+            self._index = faiss.read_index(str(index_file))
+            self._responses = json.loads(responses_file.read_text())
+        else:
+            self._index = faiss.IndexFlatIP(self._model.get_sentence_embedding_dimension())
+    
+    def _embed(self, text: str) -> np.ndarray:
+        embedding = self._model.encode([text], normalize_embeddings=True)
+        return np.asarray(embedding, dtype=np.float32)
+
+
+_semantic_recommendation_cache = SemanticRecommendationCache(settings.DATA_DIR / "cache" / "protocol_semantic")
+
+
+def _heterogeneity_score(study_type_count: int, population_count: int, treatment_count: int) -> float:
+    """Mean of the study type, population and treatment diversity ratios"""
+    
+    # Max 6 study types, 9 population types and 11 treatment categories
+    return (study_type_count / 6 + population_count / 9 + treatment_count / 11) / 3
+
+
+@dataclass
+class StudyCharacteristicArrays:
+    """Column-oriented study characteristics: category counters plus numeric arrays"""
+    study_types: Counter
+    population_types: Counter
+    treatment_categories: Counter
+    confidences: np.ndarray
+    study_sizes: List[Any]
+    
+    @classmethod
+    def from_studies(cls, studies: List[Dict[str, Any]]) -> "StudyCharacteristicArrays":
+        """Extract columns from study dicts in a single pass"""
+        
+        # `or` short-circuits avoid allocating default dicts for missing keys
+        study_types = []
+        populations = []
+        treatments = []
+        study_sizes = []
+        confidences = np.empty(len(studies), dtype=np.float64)
+        for i, study in enumerate(studies):
+            study_types.append(str(study.get('study_category') or 'Unknown'))
+            populations.append((study.get('population_types') or {}).get('populations') or ())
+            treatments.append((study.get('treatment_categories') or {}).get('treatment_categories') or ())
+            confidences[i] = (study.get('confidence_scores') or {}).get('overall', 0.5)
+            
+            # Study size (if available in metadata)
+            size = ((study.get('metadata') or {}).get('patient_demographics') or {}).get('total_enrolled')
+            if size:
+                study_sizes.append(size)
+        
+        # Keys are str so the counters serialize with orjson and sort in fingerprints
+        return cls(
+            study_types=Counter(study_types),
+            population_types=Counter(str(p or 'Unknown') for p in chain.from_iterable(populations)),
+            treatment_categories=Counter(str(t or 'Unknown') for t in chain.from_iterable(treatments)),
+            confidences=confidences,
+            study_sizes=study_sizes
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to the study characteristics dict used in prompts and protocols"""
+        
+        total_studies = len(self.confidences)
+        high_quality = int(np.count_nonzero(self.confidences > 0.8))
+        medium_quality = int(np.count_nonzero((self.confidences > 0.5) & (self.confidences <= 0.8)))
+        
+        study_type_diversity = len(self.study_types)
+        population_diversity = len(self.population_types)
+        treatment_diversity = len(self.treatment_categories)
+        
+        return {
+            'total_studies': total_studies,
+            'study_types': dict(self.study_types),
+            'population_types': dict(self.population_types),
+            'treatment_categories': dict(self.treatment_categories),
+            'geographic_distribution': {},
+            'temporal_distribution': {},
+            'data_quality_metrics': {
+                'high_quality_count': high_quality,
+                'medium_quality_count': medium_quality,
+                'low_quality_count': total_studies - high_quality - medium_quality,
+                'mean_confidence': float(self.confidences.mean()) if total_studies else 0.0
+            },
+            'study_sizes': self.study_sizes,
+            'follow_up_durations': [],
+            'primary_endpoints': {},
+            'heterogeneity_indicators': {
+                'study_type_diversity': study_type_diversity,
+                'population_diversity': population_diversity,
+                'treatment_diversity': treatment_diversity,
+                'heterogeneity_score': _heterogeneity_score(study_type_diversity, population_diversity, treatment_diversity)
+            }
+        }
+
+
+# JSON embedded in prompts is compact to save input tokens and key-sorted
+# so it is byte-stable
+PROMPT_JSON_OPTIONS = orjson.OPT_SORT_KEYS
+
+
+# Shared by every protocol prompt, ahead of the study block and the task
+PROTOCOL_INSTRUCTION_PREFIX = """You are an expert biostatistician and medical researcher designing analysis protocols for multiple myeloma research. The study characteristics of the dataset under analysis follow; the task for this request comes after them."""
+
+# Task suffixes, filled with format_map and sent after the study block
+_PROTOCOL_TYPE_PROMPT_TMPL = """Based on the study characteristics and analysis objective, recommend the optimal analysis protocol.
+
+ANALYSIS OBJECTIVE:
+{objective}
+
+USER REQUIREMENTS:
+{user_req_block}
+
+Record your recommendation with the emit_protocol_recommendation tool."""
+
+_DETAILED_PROTOCOL_TMPL = """Generate a detailed, step-by-step analysis protocol for the studies above.
+
+ANALYSIS OBJECTIVE: {objective}
+
+PROTOCOL RECOMMENDATION:
+{recommendation_block}
+
+Create a comprehensive protocol with:
+1. Data preparation steps
+2. Quality assessment procedures
+3. Statistical analysis workflow
+4. Interpretation guidelines
+5. Reporting standards
+
+Record the protocol with the emit_detailed_protocol tool, giving each step its rationale and acceptance criteria."""
+
+
+# Fallback detailed protocols, shared by every ProtocolMaker
+_PROTOCOL_TEMPLATES: Mapping[str, Dict[str, Any]] = MappingProxyType({
+    'Efficacy Analysis Protocol': {
+        'primary_focus': 'Treatment effectiveness outcomes',
+        'key_endpoints': ['Overall Response Rate', 'Progression-Free Survival', 'Overall Survival'],
+        'statistical_methods': ['Descriptive statistics', 'Meta-analysis', 'Survival analysis']
+    },
+    'Safety Analysis Protocol': {
+        'primary_focus': 'Treatment safety and tolerability',
+        'key_endpoints': ['Grade 3-4 AEs', 'Serious AEs', 'Discontinuation rates'],
+        'statistical_methods': ['Descriptive statistics', 'Risk ratios', 'Meta-analysis']
+    },
+    'Comparative Analysis Protocol': {
+        'primary_focus': 'Head-to-head treatment comparisons',
+        'key_endpoints': ['Comparative effectiveness', 'Safety profiles', 'Quality of life'],
+        'statistical_methods': ['Network meta-analysis', 'Indirect comparisons', 'MAIC']
+    }
+})
+
+
+# Protocol type each study category points to in the local heuristic
+STUDY_CATEGORY_PROTOCOLS = {
+    'Clinical Trial': ProtocolType.EFFICACY_ANALYSIS.value,
+    'Real-World Study': ProtocolType.REAL_WORLD_EVIDENCE.value,
+    'Meta-Analysis': ProtocolType.META_ANALYSIS.value,
+    'Review': ProtocolType.META_ANALYSIS.value,
+    'Case Series': ProtocolType.SAFETY_ANALYSIS.value,
+    'Preclinical': ProtocolType.BIOMARKER_ANALYSIS.value
+}
+
+
 class ProtocolMaker:
     """Advanced AI agent for generating analysis protocols and workflows"""
     
@@ -40,8 +382,63 @@ class ProtocolMaker:
         except:
             anthropic_key = settings.ANTHROPIC_API_KEY
         
-        self.anthropic_client = Anthropic(api_key=anthropic_key)
+        self.anthropic_client = AsyncAnthropic(
+            api_key=anthropic_key,
+            max_retries=settings.RETRY_ATTEMPTS,
+            timeout=settings.REQUEST_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+            )
+        )
         self.protocol_templates = self._load_protocol_templates()
+        
+        # Detailed protocols are template-like, so a faster model drafts them
+        self._detail_model = DETAIL_MODEL
+        
+        # Detailed protocols by (protocol type, complexity) -> (stored at, protocol)
+        self._template_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+        
+        # Background event loop the pooled HTTP client stays bound to
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+    
+    def run_sync(self, coro):
+        """
+        Run a coroutine of this instance to completion from synchronous code
+        
+        All calls share one background event loop, so the pooled connections
+        of the Anthropic client are reused across Streamlit reruns and sessions.
+        """
+        
+        return asyncio.run_coroutine_threadsafe(coro, self._background_loop()).result()
+    
+    def warmup(self) -> None:
+        """Open a pooled connection to the Anthropic API without blocking
+        
+        The TLS handshake then overlaps with page rendering instead of
+        delaying the first protocol request. Runs on the run_sync loop.
+        """
+        
+        asyncio.run_coroutine_threadsafe(self._warmup(), self._background_loop())
+    
+    async def _warmup(self) -> None:
+        try:
+            await self.anthropic_client.messages.count_tokens(
+                model=DETAIL_MODEL,
+                messages=[{"role": "user", "content": "x"}]
+            )
+        except Exception as e:
+            logger.debug(f"Anthropic connection warmup failed: {e}")
+    
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the shared background event loop on first use"""
+        
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="protocol-maker-loop", daemon=True).start()
+        
+        return self._loop
     
     async def generate_analysis_protocol(self, 
                                        studies: List[Dict[str, Any]], 
@@ -65,42 +462,60 @@ class ProtocolMaker:
             # Phase 1: Analyze study characteristics
             study_analysis = self._analyze_study_characteristics(studies)
             
-            # Phase 2: Determine optimal protocol type and complexity
-            protocol_recommendation = await self._determine_protocol_type(
-                study_analysis, analysis_objective, user_requirements
-            )
+            # Small inputs get a template-driven protocol without calling Claude
+            if (settings.SKIP_LLM_FOR_SMALL_INPUTS and user_requirements is None
+                    and len(studies) < SMALL_INPUT_STUDY_THRESHOLD):
+                logger.info("Small study set, generating protocol from templates")
+                protocol_recommendation = self._create_heuristic_recommendation(study_analysis)
+                detailed_protocol = {
+                    **self._get_protocol_template(protocol_recommendation['recommended_protocol_type']),
+                    'context': study_analysis
+                }
+                return self._assemble_protocol(
+                    analysis_objective, study_analysis, protocol_recommendation, detailed_protocol
+                )
             
-            # Phase 3: Generate detailed protocol steps
-            detailed_protocol = await self._generate_detailed_protocol(
-                study_analysis, protocol_recommendation, analysis_objective
+            # Phase 2: Determine protocol type with Claude
+            study_block = self._serialize_study_block(study_analysis)
+            type_task = asyncio.create_task(
+                self._determine_protocol_type(study_analysis, analysis_objective, user_requirements, study_block)
             )
             
-            # Phase 4: Create statistical analysis plan
-            statistical_plan = self._create_statistical_plan(study_analysis, protocol_recommendation)
+            # When the local heuristic is confident, prefetch the detailed
+            # protocol while the type is refined. The prefetch prompt carries
+            # only the predicted type, so no canned complexity, endpoints or
+            # methods from the fallback recommendation leak into it
+            predicted_type, vote_share = self._heuristic_protocol_type(study_analysis)
+            detailed_task = None
+            if vote_share > SPECULATIVE_PREFETCH_MIN_CONFIDENCE:
+                detailed_task = asyncio.create_task(self._generate_detailed_protocol(
+                    study_analysis, {'recommended_protocol_type': predicted_type}, analysis_objective, study_block
+                ))
             
-            # Phase 5: Generate quality assessment framework
-            quality_framework = self._create_quality_framework(study_analysis)
+            try:
+                protocol_recommendation = await type_task
+            except BaseException:
+                if detailed_task is not None:
+                    await self._discard_task(detailed_task)
+                raise
             
-            # Phase 6: Create validation and sensitivity analysis plan
-            validation_plan = self._create_validation_plan(study_analysis)
+            # Phase 3: Generate detailed protocol, unless the prefetch predicted the
+            # type; a kept prefetch is written for the type, not for Claude's
+            # complexity and endpoints
+            if (detailed_task is not None
+                    and protocol_recommendation.get('recommended_protocol_type') == predicted_type):
+                detailed_protocol = await detailed_task
+            else:
+                if detailed_task is not None:
+                    logger.info("Protocol type refined away from heuristic, discarding prefetched protocol")
+                    await self._discard_task(detailed_task)
+                detailed_protocol = await self._generate_detailed_protocol(
+                    study_analysis, protocol_recommendation, analysis_objective, study_block
+                )
             
-            # Combine all components
-            comprehensive_protocol = {
-                'protocol_id': f"ASCOMIND_PROTOCOL_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                'generation_timestamp': datetime.now().isoformat(),
-                'analysis_objective': analysis_objective,
-                'study_overview': study_analysis,
-                'protocol_recommendation': protocol_recommendation,
-                'detailed_protocol': detailed_protocol,
-                'statistical_analysis_plan': statistical_plan,
-                'quality_assessment': quality_framework,
-                'validation_plan': validation_plan,
-                'estimated_timeline': self._estimate_timeline(protocol_recommendation),
-                'resource_requirements': self._estimate_resources(protocol_recommendation),
-                'deliverables': self._define_deliverables(protocol_recommendation),
-                'risk_mitigation': self._identify_risks(study_analysis),
-                'protocol_version': '1.0'
-            }
+            comprehensive_protocol = self._assemble_protocol(
+                analysis_objective, study_analysis, protocol_recommendation, detailed_protocol
+            )
             
             logger.info("Analysis protocol generated successfully")
             return comprehensive_protocol
@@ -109,158 +524,339 @@ class ProtocolMaker:
             logger.error(f"Error generating analysis protocol: {str(e)}")
             return self._create_fallback_protocol(analysis_objective)
     
-    def _analyze_study_characteristics(self, studies: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Analyze characteristics of input studies"""
-        
-        characteristics = {
-            'total_studies': len(studies),
-            'study_types': {},
-            'population_types': {},
-            'treatment_categories': {},
-            'geographic_distribution': {},
-            'temporal_distribution': {},
-            'data_quality_metrics': {
-                'high_quality_count': 0,
-                'medium_quality_count': 0,
-                'low_quality_count': 0,
-                'mean_confidence': 0.0
-            },
-            'study_sizes': [],
-            'follow_up_durations': [],
-            'primary_endpoints': {},
-            'heterogeneity_indicators': {}
-        }
+    @staticmethod
+    async def _discard_task(task: asyncio.Task) -> None:
+        """Cancel a speculative task and wait for it, so its outcome is retrieved"""
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Discarded speculative task failed: {e}")
+    
+    async def generate_analysis_protocols_batch(self,
+                                                jobs: List[Tuple[List[Dict[str, Any]], str, Optional[Dict]]]) -> List[Dict[str, Any]]:
+        """
+        Generate many analysis protocols through Anthropic's Message Batches API
         
-        total_confidence = 0
+        Batched requests cost half as much as real-time calls and are not bound
+        by the per-minute rate limits, so use this for non-interactive bulk runs.
+        Protocol type and detailed protocol run as two sequential batches since
+        the second depends on the first. Jobs that fail in either batch are
+        regenerated through the real-time path.
         
-        for study in studies:
-            # Study types
-            study_type = study.get('study_category', 'Unknown')
-            characteristics['study_types'][study_type] = characteristics['study_types'].get(study_type, 0) + 1
-            
-            # Population analysis
-            populations = study.get('population_types', {}).get('populations', [])
-            for pop in populations:
-                characteristics['population_types'][pop] = characteristics['population_types'].get(pop, 0) + 1
+        Args:
+            jobs: (studies, analysis_objective, user_requirements) tuples
             
-            # Treatment categories
-            treatments = study.get('treatment_categories', {}).get('treatment_categories', [])
-            for treatment in treatments:
-                characteristics['treatment_categories'][treatment] = characteristics['treatment_categories'].get(treatment, 0) + 1
+        Returns:
+            One comprehensive protocol per job, in input order
+        """
+        
+        logger.info(f"Generating {len(jobs)} analysis protocols via message batches")
+        
+        study_analyses: List[Dict[str, Any]] = []
+        recommendations: Dict[int, Dict[str, Any]] = {}
+        detailed_protocols: Dict[int, Dict[str, Any]] = {}
+        
+        try:
+            study_analyses = [self._analyze_study_characteristics(studies) for studies, _, _ in jobs]
+            study_blocks = [self._serialize_study_block(study_analysis) for study_analysis in study_analyses]
             
-            # Quality assessment
-            confidence = study.get('confidence_scores', {}).get('overall', 0.5)
-            total_confidence += confidence
+            # Stage 1: protocol type recommendations
+            type_results = await self._run_message_batch({
+                f"job-{i}-type": (self._protocol_type_prompt(study_block, objective, user_requirements),
+                                  PROTOCOL_RECOMMENDATION_TOOL, 1500)
+                for i, (study_block, (_, objective, user_requirements)) in enumerate(zip(study_blocks, jobs))
+            })
+            for i in range(len(jobs)):
+                if f"job-{i}-type" in type_results:
+                    recommendations[i] = type_results[f"job-{i}-type"]
             
-            if confidence > 0.8:
-                characteristics['data_quality_metrics']['high_quality_count'] += 1
-            elif confidence > 0.5:
-                characteristics['data_quality_metrics']['medium_quality_count'] += 1
+            # Stage 2: detailed protocols for jobs with a recommendation
+            if recommendations:
+                detail_results = await self._run_message_batch({
+                    f"job-{i}-detail": (self._detailed_protocol_prompt(study_blocks[i], recommendation, jobs[i][1]),
+                                        DETAILED_PROTOCOL_TOOL, 2000)
+                    for i, recommendation in recommendations.items()
+                }, model=self._detail_model)
+                for i in recommendations:
+                    if self._is_valid_detailed_protocol(detail_results.get(f"job-{i}-detail")):
+                        detailed_protocols[i] = {**detail_results[f"job-{i}-detail"], 'context': study_analyses[i]}
+        except Exception as e:
+            logger.error(f"Message batch failed, falling back to real-time generation: {str(e)}")
+        
+        protocols: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+        failed_jobs = []
+        for i, (_, objective, _) in enumerate(jobs):
+            if i in detailed_protocols:
+                protocols[i] = self._assemble_protocol(
+                    objective, study_analyses[i], recommendations[i], detailed_protocols[i]
+                )
             else:
-                characteristics['data_quality_metrics']['low_quality_count'] += 1
+                failed_jobs.append(i)
+        
+        if failed_jobs:
+            logger.warning(f"{len(failed_jobs)} batch jobs failed, regenerating in real time")
+            fallback_protocols = await asyncio.gather(*(
+                self.generate_analysis_protocol(*jobs[i]) for i in failed_jobs
+            ))
+            for i, protocol in zip(failed_jobs, fallback_protocols):
+                protocols[i] = protocol
+        
+        return protocols
+    
+    async def _run_message_batch(self, requests: Dict[str, Tuple[List[Dict[str, Any]], Dict[str, Any], int]],
+                                 model: str = PROTOCOL_MODEL) -> Dict[str, Dict[str, Any]]:
+        """Submit forced tool calls as one message batch and wait for the tool inputs
+        
+        Args:
+            requests: custom_id -> (prompt content, tool, max_tokens)
+            model: Claude model for every request in the batch
             
-            # Study size (if available in metadata)
-            if 'metadata' in study and study['metadata'].get('patient_demographics'):
-                size = study['metadata']['patient_demographics'].get('total_enrolled')
-                if size:
-                    characteristics['study_sizes'].append(size)
-        
-        # Calculate averages
-        if studies:
-            characteristics['data_quality_metrics']['mean_confidence'] = total_confidence / len(studies)
-        
-        # Assess heterogeneity
-        characteristics['heterogeneity_indicators'] = {
-            'study_type_diversity': len(characteristics['study_types']),
-            'population_diversity': len(characteristics['population_types']),
-            'treatment_diversity': len(characteristics['treatment_categories']),
-            'heterogeneity_score': self._calculate_heterogeneity_score(characteristics)
+        Returns:
+            custom_id -> tool input for every request that completed
+        """
+        
+        batch = await self.anthropic_client.messages.batches.create(requests=[
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": model,
+                    "max_tokens": max_tokens,
+                    "temperature": 0.1,
+                    "tools": [tool],
+                    "tool_choice": {"type": "tool", "name": tool["name"]},
+                    "messages": [{"role": "user", "content": prompt}]
+                }
+            }
+            for custom_id, (prompt, tool, max_tokens) in requests.items()
+        ])
+        logger.info(f"Submitted message batch {batch.id} with {len(requests)} requests")
+        
+        while batch.processing_status != "ended":
+            await asyncio.sleep(MESSAGE_BATCH_POLL_SECONDS)
+            batch = await self.anthropic_client.messages.batches.retrieve(batch.id)
+        
+        results = {}
+        async for entry in await self.anthropic_client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded" and entry.result.message.stop_reason != "max_tokens":
+                results[entry.custom_id] = entry.result.message.content[0].input
+            else:
+                logger.warning(f"Batch request {entry.custom_id} {entry.result.type}")
+        
+        return results
+    
+    def _assemble_protocol(self,
+                           analysis_objective: str,
+                           study_analysis: Dict[str, Any],
+                           protocol_recommendation: Dict[str, Any],
+                           detailed_protocol: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine the LLM-generated parts with the rule-based plans into a protocol"""
+        
+        # Phase 4: Create statistical analysis plan
+        statistical_plan = self._create_statistical_plan(study_analysis, protocol_recommendation)
+        
+        # Phase 5: Generate quality assessment framework
+        quality_framework = self._create_quality_framework(study_analysis)
+        
+        # Phase 6: Create validation and sensitivity analysis plan
+        validation_plan = self._create_validation_plan(study_analysis)
+        
+        # Combine all components
+        return {
+            'protocol_id': f"ASCOMIND_PROTOCOL_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            'generation_timestamp': datetime.now().isoformat(),
+            'analysis_objective': analysis_objective,
+            'study_overview': study_analysis,
+            'protocol_recommendation': protocol_recommendation,
+            'detailed_protocol': detailed_protocol,
+            'statistical_analysis_plan': statistical_plan,
+            'quality_assessment': quality_framework,
+            'validation_plan': validation_plan,
+            'estimated_timeline': self._estimate_timeline(protocol_recommendation),
+            'resource_requirements': self._estimate_resources(protocol_recommendation),
+            'deliverables': self._define_deliverables(protocol_recommendation),
+            'risk_mitigation': self._identify_risks(study_analysis),
+            'protocol_version': '1.0'
         }
+    
+    def _analyze_study_characteristics(self, studies: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Analyze characteristics of input studies"""
         
-        return characteristics
+        return StudyCharacteristicArrays.from_studies(studies).to_dict()
     
     async def _determine_protocol_type(self, 
                                      study_analysis: Dict[str, Any], 
                                      objective: str,
-                                     user_requirements: Optional[Dict] = None) -> Dict[str, Any]:
+                                     user_requirements: Optional[Dict] = None,
+                                     study_block: Optional[str] = None) -> Dict[str, Any]:
         """Determine optimal protocol type and complexity using AI"""
         
-        prompt = f"""You are an expert biostatistician and medical researcher. Based on the study characteristics and analysis objective, recommend the optimal analysis protocol.
-
-STUDY CHARACTERISTICS:
-{json.dumps(study_analysis, indent=2)}
-
-ANALYSIS OBJECTIVE:
-{objective}
-
-USER REQUIREMENTS:
-{json.dumps(user_requirements or {}, indent=2)}
-
-Provide a JSON response with:
-{{
-    "recommended_protocol_type": "Efficacy Analysis Protocol" | "Safety Analysis Protocol" | "Comparative Analysis Protocol" | "Meta-Analysis Protocol" | "Real-World Evidence Protocol" | "Biomarker Analysis Protocol" | "Health Economics Protocol",
-    "complexity_level": "Basic" | "Intermediate" | "Advanced" | "Expert",
-    "primary_endpoints": ["list of primary endpoints to focus on"],
-    "secondary_endpoints": ["list of secondary endpoints"],
-    "statistical_methods": ["recommended statistical approaches"],
-    "potential_challenges": ["identified analysis challenges"],
-    "data_requirements": ["specific data requirements"],
-    "confidence_score": 0.0-1.0,
-    "reasoning": "detailed explanation of recommendations"
-}}"""
-        
-        message = self.anthropic_client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1500,
-            temperature=0.1,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        # Near-identical study sets reuse an earlier recommendation
+        fingerprint = self._study_set_fingerprint(study_analysis, objective, user_requirements)
+        if settings.PROTOCOL_SEMANTIC_CACHE_ENABLED:
+            cached_recommendation = await asyncio.to_thread(_semantic_recommendation_cache.lookup, fingerprint)
+            if cached_recommendation is not None:
+                logger.info("Protocol recommendation served from semantic cache")
+                return cached_recommendation
         
-        try:
-            response = json.loads(message.content[0].text)
-            return response
-        except:
-            logger.warning("Could not parse protocol recommendation, using fallback")
+        if study_block is None:
+            study_block = self._serialize_study_block(study_analysis)
+        prompt = self._protocol_type_prompt(study_block, objective, user_requirements)
+        
+        response = await self._cached_tool_call(prompt, PROTOCOL_RECOMMENDATION_TOOL, max_tokens=1500)
+        if response is None:
+            logger.warning("Protocol recommendation was truncated, using fallback")
             return self._create_fallback_recommendation(study_analysis, objective)
+        
+        if settings.PROTOCOL_SEMANTIC_CACHE_ENABLED:
+            await asyncio.to_thread(_semantic_recommendation_cache.add, fingerprint, response)
+        return response
+    
+    def _study_set_fingerprint(self, study_analysis: Dict[str, Any], objective: str,
+                               user_requirements: Optional[Dict] = None) -> str:
+        """Canonical text describing a study set, for semantic cache matching"""
+        
+        return "\n".join([
+            "study types: " + ", ".join(sorted(study_analysis.get('study_types', {}))),
+            "populations: " + ", ".join(sorted(study_analysis.get('population_types', {}))),
+            "treatments: " + ", ".join(sorted(study_analysis.get('treatment_categories', {}))),
+            "objective: " + objective.strip(),
+            "requirements: " + orjson.dumps(user_requirements or {}, option=orjson.OPT_SORT_KEYS).decode()
+        ])
     
     async def _generate_detailed_protocol(self, 
                                         study_analysis: Dict[str, Any],
                                         protocol_recommendation: Dict[str, Any],
-                                        objective: str) -> Dict[str, Any]:
-        """Generate detailed step-by-step protocol"""
+                                        objective: str,
+                                        study_block: Optional[str] = None) -> Dict[str, Any]:
+        """Generate detailed step-by-step protocol
         
-        prompt = f"""Generate a detailed, step-by-step analysis protocol for multiple myeloma research.
-
-ANALYSIS OBJECTIVE: {objective}
-
-PROTOCOL RECOMMENDATION:
-{json.dumps(protocol_recommendation, indent=2)}
-
-STUDY CHARACTERISTICS:
-{json.dumps(study_analysis, indent=2)}
-
-Create a comprehensive protocol with:
-1. Data preparation steps
-2. Quality assessment procedures
-3. Statistical analysis workflow
-4. Interpretation guidelines
-5. Reporting standards
-
-Format as JSON with detailed steps, rationale, and acceptance criteria for each phase."""
+        Cached, freshly generated and template fallback protocols all carry
+        the study analysis under 'context'.
+        """
         
-        message = self.anthropic_client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=2000,
-            temperature=0.1,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        # Detailed protocols barely vary within a protocol type and complexity;
+        # type-only prefetch recommendations have no complexity and bypass the cache
+        template_key = None
+        if 'complexity_level' in protocol_recommendation:
+            template_key = (
+                protocol_recommendation.get('recommended_protocol_type', 'Efficacy Analysis Protocol'),
+                protocol_recommendation['complexity_level']
+            )
+        cached = self._template_cache.get(template_key) if template_key else None
+        if cached is not None and time.monotonic() - cached[0] < DETAILED_PROTOCOL_TTL_SECONDS:
+            logger.info(f"Detailed protocol served from template cache: {template_key}")
+            return {**copy.deepcopy(cached[1]), 'context': study_analysis}
+        
+        if study_block is None:
+            study_block = self._serialize_study_block(study_analysis)
+        prompt = self._detailed_protocol_prompt(study_block, protocol_recommendation, objective)
+        
+        response = await self._cached_tool_call(prompt, DETAILED_PROTOCOL_TOOL, max_tokens=2000, model=self._detail_model)
+        if not self._is_valid_detailed_protocol(response):
+            logger.info("Detailed protocol draft failed validation, retrying with primary model")
+            response = await self._cached_tool_call(prompt, DETAILED_PROTOCOL_TOOL, max_tokens=2000)
+        if not self._is_valid_detailed_protocol(response):
+            logger.warning("Detailed protocol was truncated or failed validation, using template")
+            return {
+                **self._get_protocol_template(protocol_recommendation.get('recommended_protocol_type', 'Efficacy Analysis Protocol')),
+                'context': study_analysis
+            }
+        
+        if template_key:
+            self._template_cache[template_key] = (time.monotonic(), copy.deepcopy(response))
+        return {**response, 'context': study_analysis}
+    
+    def _is_valid_detailed_protocol(self, response: Optional[Dict[str, Any]]) -> bool:
+        """Whether a detailed protocol tool input matches the DetailedProtocol schema"""
         
+        if response is None:
+            return False
         try:
-            response = json.loads(message.content[0].text)
-            return response
-        except:
-            logger.warning("Could not parse detailed protocol, using template")
-            return self._get_protocol_template(protocol_recommendation.get('recommended_protocol_type', 'Efficacy Analysis Protocol'))
+            DetailedProtocol.model_validate(response)
+        except ValidationError:
+            return False
+        return True
+    
+    def _protocol_type_prompt(self, study_block: str, objective: str,
+                              user_requirements: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Prompt asking Claude for the protocol type recommendation"""
+        
+        return self._study_prompt_blocks(study_block, _PROTOCOL_TYPE_PROMPT_TMPL.format_map({
+            'objective': objective,
+            'user_req_block': orjson.dumps(user_requirements or {}, option=PROMPT_JSON_OPTIONS).decode()
+        }))
+    
+    def _detailed_protocol_prompt(self, study_block: str,
+                                  protocol_recommendation: Dict[str, Any],
+                                  objective: str) -> List[Dict[str, Any]]:
+        """Prompt asking Claude for the detailed step-by-step protocol"""
+        
+        return self._study_prompt_blocks(study_block, _DETAILED_PROTOCOL_TMPL.format_map({
+            'objective': objective,
+            'recommendation_block': orjson.dumps(protocol_recommendation, option=PROMPT_JSON_OPTIONS).decode()
+        }))
+    
+    def _serialize_study_block(self, study_analysis: Dict[str, Any]) -> str:
+        """Serialize study characteristics once for every prompt that embeds them"""
+        
+        return "STUDY CHARACTERISTICS:\n" + orjson.dumps(study_analysis, option=PROMPT_JSON_OPTIONS).decode()
+    
+    def _study_prompt_blocks(self, study_block: str, task: str) -> List[Dict[str, Any]]:
+        """Build prompt content blocks: instruction prefix, study block, task"""
+        
+        return [
+            {"type": "text", "text": PROTOCOL_INSTRUCTION_PREFIX},
+            {"type": "text", "text": study_block},
+            {"type": "text", "text": task}
+        ]
+    
+    async def _cached_tool_call(self, prompt: Union[str, List[Dict[str, Any]]],
+                                tool: Dict[str, Any], max_tokens: int,
+                                model: str = PROTOCOL_MODEL,
+                                temperature: float = 0.1) -> Optional[Dict[str, Any]]:
+        """Force Claude to call tool and return its input, serving repeats from cache
+        
+        Responses are keyed by a SHA-256 of the request parameters and kept in
+        an in-memory LRU backed by JSON files under data/cache. Only
+        low-temperature calls are cached. Returns None if the output was cut
+        off at max_tokens, since the tool input is then incomplete.
+        """
+        
+        cacheable = temperature <= 0.1
+        if cacheable:
+            cache_key = hashlib.sha256(orjson.dumps({
+                'model': model,
+                'prompt': prompt,
+                'tool': tool,
+                'max_tokens': max_tokens,
+                'temperature': temperature
+            }, option=orjson.OPT_SORT_KEYS)).hexdigest()
+            
+            cached_response = _get_cached_response(cache_key)
+            if cached_response is not None:
+                logger.info(f"Protocol LLM cache hit: {cache_key[:12]}")
+                return cached_response
+        
+        async with self.anthropic_client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            tools=[tool],
+            tool_choice={"type": "tool", "name": tool["name"]},
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            message = await stream.get_final_message()
+        if message.stop_reason == "max_tokens":
+            return None
+        response = message.content[0].input
+        
+        if cacheable:
+            _store_cached_response(cache_key, response)
+        
+        return response
     
     def _create_statistical_plan(self, study_analysis: Dict[str, Any], protocol_recommendation: Dict[str, Any]) -> Dict[str, Any]:
         """Create detailed statistical analysis plan"""
@@ -535,45 +1131,52 @@ Format as JSON with detailed steps, rationale, and acceptance criteria for each
         
         return risks
     
-    def _calculate_heterogeneity_score(self, characteristics: Dict[str, Any]) -> float:
-        """Calculate overall heterogeneity score"""
+    def _load_protocol_templates(self) -> Mapping[str, Dict]:
+        """Load predefined protocol templates"""
         
-        # Calculate diversity metrics directly from characteristics data
-        study_type_diversity = len(characteristics['study_types']) / 6  # Max 6 study types
-        population_diversity = len(characteristics['population_types']) / 9  # Max 9 population types
-        treatment_diversity = len(characteristics['treatment_categories']) / 11  # Max 11 treatment categories
+        return _PROTOCOL_TEMPLATES
+    
+    def _get_protocol_template(self, protocol_type: str) -> Dict[str, Any]:
+        """Get a copy of the template for a protocol type, defaulting to efficacy
         
-        diversity_metrics = [study_type_diversity, population_diversity, treatment_diversity]
+        The templates are shared; the copy keeps callers' edits to the
+        returned protocol out of them.
+        """
         
-        return sum(diversity_metrics) / len(diversity_metrics)
+        return copy.deepcopy(
+            _PROTOCOL_TEMPLATES.get(protocol_type, _PROTOCOL_TEMPLATES['Efficacy Analysis Protocol'])
+        )
     
-    def _load_protocol_templates(self) -> Dict[str, Dict]:
-        """Load predefined protocol templates"""
+    def _heuristic_protocol_type(self, study_analysis: Dict[str, Any]) -> Tuple[str, float]:
+        """Predict the protocol type locally by majority vote over study categories
         
-        templates = {
-            'Efficacy Analysis Protocol': {
-                'primary_focus': 'Treatment effectiveness outcomes',
-                'key_endpoints': ['Overall Response Rate', 'Progression-Free Survival', 'Overall Survival'],
-                'statistical_methods': ['Descriptive statistics', 'Meta-analysis', 'Survival analysis']
-            },
-            'Safety Analysis Protocol': {
-                'primary_focus': 'Treatment safety and tolerability',
-                'key_endpoints': ['Grade 3-4 AEs', 'Serious AEs', 'Discontinuation rates'],
-                'statistical_methods': ['Descriptive statistics', 'Risk ratios', 'Meta-analysis']
-            },
-            'Comparative Analysis Protocol': {
-                'primary_focus': 'Head-to-head treatment comparisons',
-                'key_endpoints': ['Comparative effectiveness', 'Safety profiles', 'Quality of life'],
-                'statistical_methods': ['Network meta-analysis', 'Indirect comparisons', 'MAIC']
-            }
-        }
+        Returns the predicted type and the vote share behind it.
+        """
+        
+        votes: Dict[str, int] = {}
+        for study_type, count in study_analysis.get('study_types', {}).items():
+            protocol_type = STUDY_CATEGORY_PROTOCOLS.get(study_type, ProtocolType.EFFICACY_ANALYSIS.value)
+            votes[protocol_type] = votes.get(protocol_type, 0) + count
         
-        return templates
+        total_votes = sum(votes.values())
+        if not total_votes:
+            return ProtocolType.EFFICACY_ANALYSIS.value, 0.0
+        
+        protocol_type = max(votes, key=votes.get)
+        return protocol_type, votes[protocol_type] / total_votes
     
-    def _get_protocol_template(self, protocol_type: str) -> Dict[str, Any]:
-        """Get template for specific protocol type"""
+    def _create_heuristic_recommendation(self, study_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a preliminary recommendation without calling the LLM"""
         
-        return self.protocol_templates.get(protocol_type, self.protocol_templates['Efficacy Analysis Protocol'])
+        protocol_type, vote_share = self._heuristic_protocol_type(study_analysis)
+        
+        recommendation = self._create_fallback_recommendation(study_analysis, "")
+        recommendation.update({
+            'recommended_protocol_type': protocol_type,
+            'confidence_score': vote_share,
+            'reasoning': 'Preliminary recommendation from study category distribution'
+        })
+        return recommendation
     
     def _create_fallback_recommendation(self, study_analysis: Dict[str, Any], objective: str) -> Dict[str, Any]:
         """Create fallback recommendation when AI fails"""
@@ -609,5 +1212,13 @@ Format as JSON with detailed steps, rationale, and acceptance criteria for each
         }
 
 
+@st.cache_resource
+def get_protocol_maker() -> ProtocolMaker:
+    """Shared ProtocolMaker, created once per Streamlit server process"""
+    protocol_maker = ProtocolMaker()
+    protocol_maker.warmup()
+    return protocol_maker
+
+
 # Export main class
-__all__ = ['ProtocolMaker', 'ProtocolType', 'AnalysisComplexity'] 
\ No newline at end of file
+__all__ = ['ProtocolMaker', 'ProtocolType', 'AnalysisComplexity', 'get_protocol_maker'] 
\ No newline at end of file
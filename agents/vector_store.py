@@ -3,20 +3,171 @@
 import hashlib
 import json
 import logging
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import asyncio
 import uuid
 
+import httpx
 import openai
 import pinecone
 from pinecone import Pinecone, ServerlessSpec
+try:
+    from pinecone.grpc import PineconeGRPC
+except ImportError:
+    PineconeGRPC = None
 import numpy as np
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+import xxhash
 from pydantic import BaseModel
 
 from models.abstract_metadata import ComprehensiveAbstractMetadata
 from config.settings import settings
 
+# Metadata value types Pinecone stores as-is
+_PINECONE_PRIMITIVES = (str, int, float, bool)
+
+# Maximum number of texts sent in one embeddings request
+EMBEDDING_BATCH_SIZE = 96
+
+# Texts are cut to this many tokens before embedding; the OpenAI
+# embedding models reject inputs over 8192 tokens
+EMBEDDING_MAX_TOKENS = 8000
+
+# Vectors per upsert request: gRPC carries 100 3072-dim vectors within the
+# 2 MB request limit, JSON over REST only about a third of that
+GRPC_UPSERT_BATCH_SIZE = 100
+REST_UPSERT_BATCH_SIZE = 32
+
+# Decimal places kept when embeddings travel as JSON; about 2.5x smaller
+# payloads with no measurable effect on cosine similarity
+REST_EMBEDDING_DECIMALS = 5
+UPSERT_CONCURRENCY = 8
+
+# Most matches Pinecone returns for one query; filtered session queries
+# (pod indexes, legacy vector migration) see at most this many IDs per call
+SESSION_QUERY_TOP_K = 10000
+
+# Legacy vectors fetched and re-keyed per request during ID migration
+LEGACY_MIGRATION_BATCH_SIZE = 100
+# In-memory embeddings kept per store for repeated chunk texts; float32 rows
+# keep 2048 3072-dim entries around 25 MB
+CHUNK_EMBEDDING_CACHE_SIZE = 2048
+
+EMBEDDING_CACHE_PATH = settings.DATA_DIR / "cache" / "embeddings.sqlite"
+
+
+# Text templates for the structured abstract chunks
+_STUDY_SUMMARY_TEMPLATE = (
+    "Study: {title}\n"
+    "Type: {study_type}\n"
+    "Population: {population}\n"
+    "Line of Therapy: {line_of_therapy}\n"
+    "Enrollment: {enrollment} patients"
+)
+_EFFICACY_TEMPLATE = (
+    "Efficacy Results for {title}:\n"
+    "Overall Response Rate: {orr}%\n"
+    "Progression-Free Survival: {pfs} months\n"
+    "Complete Response Rate: {cr}%"
+)
+
+
+@lru_cache(maxsize=None)
+def _openai_client(api_key: Optional[str]) -> openai.OpenAI:
+    """OpenAI client shared by every vector store using api_key
+    
+    The client is thread-safe, so sessions reuse one keep-alive pool instead
+    of each opening its own connections.
+    """
+    return openai.OpenAI(
+        api_key=api_key,
+        max_retries=3,
+        timeout=settings.REQUEST_TIMEOUT,
+        http_client=httpx.Client(limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+    )
+
+
+@lru_cache(maxsize=1)
+def _embedding_tokenizer():
+    """Shared tokenizer for embedding inputs, None without tiktoken"""
+    return tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+
+@lru_cache(maxsize=None)
+def _subtype_values(subtypes: Tuple[Any, ...]) -> Tuple[str, ...]:
+    """String values of a tuple of MM subtype enums"""
+    return tuple(subtype.value for subtype in subtypes)
+
+
+def _reported(value: Any) -> Any:
+    """Outcome value for chunk text, or 'Not reported'"""
+    return 'Not reported' if value is None else value
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model, sha256(text))
+    
+    Embeddings are stored as float16 blobs, half the size of float32 with
+    negligible effect on cosine similarity.
+    """
+    
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, embedding BLOB NOT NULL, "
+                "PRIMARY KEY (model, text_hash))"
+            )
+            self._conn.commit()
+    
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+    
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached embedding for each text, None where missing"""
+        hashes = [self._text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings WHERE model = ? "
+                    f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk]
+                ).fetchall()
+                found.update(rows)
+        
+        return [
+            np.frombuffer(found[text_hash], dtype=np.float16).astype(np.float32).tolist()
+            if text_hash in found else None
+            for text_hash in hashes
+        ]
+    
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """Store embeddings for texts"""
+        rows = [
+            (model, self._text_hash(text), np.asarray(embedding, dtype=np.float16).tobytes())
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+
 class VectorMetadata(BaseModel):
     """Structured metadata for vector storage"""
     abstract_id: str
@@ -41,28 +192,82 @@ class VectorMetadata(BaseModel):
 class IntelligentVectorStore:
     """Advanced vector storage with Pinecone for medical abstracts - Session Isolated"""
     
-    def __init__(self, session_id: Optional[str] = None):
+    def __init__(self, session_id: Optional[str] = None, cache_embeddings: bool = True):
         self.logger = logging.getLogger(__name__)
-        self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.openai_client = _openai_client(settings.OPENAI_API_KEY)
+        
+        # Embeddings of unchanged chunk texts are reused across sessions
+        self._embedding_cache = None
+        if cache_embeddings:
+            try:
+                self._embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+            except Exception as e:
+                self.logger.warning(f"Embedding cache unavailable: {e}")
+        self._chunk_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
         
         # Session management for data isolation
         self.session_id = session_id or self._generate_session_id()
         self.logger.info(f"Initializing vector store for session: {self.session_id}")
+        self._cancer_type = self._cancer_type_from_session()
+        self._session_hasher = hashlib.sha256(f"{self.session_id}:".encode())
         
         # Initialize Pinecone
-        self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+        # gRPC moves batched upserts faster when the grpc extra is installed
+        if PineconeGRPC is not None:
+            self.pc = PineconeGRPC(api_key=settings.PINECONE_API_KEY)
+            self._upsert_batch_size = GRPC_UPSERT_BATCH_SIZE
+            self._embedding_decimals = None  # gRPC sends packed float32 already
+        else:
+            self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
+            self._upsert_batch_size = REST_UPSERT_BATCH_SIZE
+            self._embedding_decimals = REST_EMBEDDING_DECIMALS
         self.index_name = settings.PINECONE_INDEX_NAME
         self.embedding_model = "text-embedding-3-large"
         self.embedding_dimension = 3072  # text-embedding-3-large dimension
+        self._tokenizer = _embedding_tokenizer()
         
         # Initialize or connect to index
         self._initialize_index()
         self.index = self.pc.Index(self.index_name)
         
+        self._filtered_stats_supported = True
+        self._id_listing_supported = True
+        
+        if settings.VECTOR_STORE_MIGRATE_LEGACY_IDS:
+            try:
+                self._migrate_legacy_vector_ids()
+            except Exception as e:
+                self.logger.warning(f"Could not migrate legacy vector IDs: {e}")
+        
         # Session-specific cache for deduplication
         self._session_content_hashes = set()
         self._load_session_hashes()
     
+    def _cancer_type_from_session(self) -> str:
+        """Extract cancer type from session ID"""
+        cancer_type = "multiple_myeloma"  # Default fallback
+        
+        # Try to extract cancer type from session ID patterns
+        if self.session_id:
+            # Pattern 1: "cancer_prostate_" or "cancer_multiple_myeloma_"
+            if "cancer_" in self.session_id:
+                cancer_type = self.session_id.split("cancer_")[1].split("_")[0]
+            # Pattern 2: "prostate_clean_" or "prostate_batch_"
+            elif "prostate_" in self.session_id:
+                cancer_type = "prostate"
+            # Pattern 3: "multiple_myeloma_" or "mm_"
+            elif "multiple_myeloma_" in self.session_id or "mm_" in self.session_id:
+                cancer_type = "multiple_myeloma"
+            # Pattern 4: Other cancer types
+            elif "breast_" in self.session_id:
+                cancer_type = "breast"
+            elif "lung_" in self.session_id:
+                cancer_type = "lung"
+            elif "colorectal_" in self.session_id:
+                cancer_type = "colorectal"
+        
+        return cancer_type
+    
     def _generate_session_id(self) -> str:
         """Generate unique session ID"""
         # Use timestamp + random UUID for uniqueness
@@ -81,6 +286,7 @@ class IntelligentVectorStore:
                     name=self.index_name,
                     dimension=self.embedding_dimension,
                     metric="cosine",
+                    vector_type="dense",
                     spec=ServerlessSpec(
                         cloud="aws",
                         region="us-east-1"
@@ -94,20 +300,97 @@ class IntelligentVectorStore:
             self.logger.error(f"Error initializing Pinecone index: {e}")
             raise
     
+    def _session_vector_ids(self) -> List[str]:
+        """IDs of every vector stored for the current session
+        
+        Vector IDs are prefixed with the session ID, so serverless indexes
+        enumerate them with Pinecone's ID listing. Pod indexes have no ID
+        listing; after the first refusal they fall back to a filtered query,
+        which sees at most SESSION_QUERY_TOP_K IDs.
+        """
+        if self._id_listing_supported:
+            try:
+                return [
+                    vector_id
+                    for page in self.index.list(prefix=f"{self.session_id}:")
+                    for vector_id in page
+                ]
+            except Exception as e:
+                self.logger.debug(f"Vector ID listing unavailable, using filtered query: {e}")
+                self._id_listing_supported = False
+        return self._queried_session_vector_ids()
+    
+    def _queried_session_vector_ids(self) -> List[str]:
+        """Up to SESSION_QUERY_TOP_K session vector IDs from a metadata-filtered query"""
+        response = self.index.query(
+            vector=[0.0] * self.embedding_dimension,
+            top_k=SESSION_QUERY_TOP_K,
+            include_metadata=False,
+            filter={"session_id": self.session_id}
+        )
+        return [match['id'] for match in response['matches']]
+    
+    def _migrate_legacy_vector_ids(self) -> int:
+        """Re-key session vectors written before IDs carried the session prefix
+        
+        Unprefixed vectors are invisible to ID listing, and force_update
+        re-embeds would write prefixed copies next to them. Each one is
+        fetched, upserted as `{session}:{old id}` and deleted. The filtered
+        query is repeated until it surfaces no new legacy IDs, so sessions
+        past the query's top_k are migrated too. Enabled once per index
+        through settings.VECTOR_STORE_MIGRATE_LEGACY_IDS.
+        """
+        prefix = f"{self.session_id}:"
+        migrated = set()
+        while True:
+            legacy_ids = [
+                vector_id for vector_id in self._queried_session_vector_ids()
+                if not vector_id.startswith(prefix) and vector_id not in migrated
+            ]
+            if not legacy_ids:
+                break
+            
+            for start in range(0, len(legacy_ids), LEGACY_MIGRATION_BATCH_SIZE):
+                batch = legacy_ids[start:start + LEGACY_MIGRATION_BATCH_SIZE]
+                fetched = self.index.fetch(ids=batch).vectors
+                vectors = [
+                    (prefix + vector_id, list(vector.values), vector.metadata)
+                    for vector_id, vector in fetched.items()
+                ]
+                for upsert_start in range(0, len(vectors), self._upsert_batch_size):
+                    self.index.upsert(vectors=vectors[upsert_start:upsert_start + self._upsert_batch_size])
+                self.index.delete(ids=batch)
+            migrated.update(legacy_ids)
+        
+        if migrated:
+            self.logger.info(f"Migrated {len(migrated)} legacy vector IDs for session {self.session_id}")
+        return len(migrated)
+    
+    def _session_vector_count(self) -> int:
+        """Number of vectors stored for the current session
+        
+        Pod indexes answer this from filtered index stats in one call.
+        Serverless indexes reject stats filters, so after the first refusal
+        the count comes from the session's vector IDs.
+        """
+        if self._filtered_stats_supported:
+            try:
+                stats = self.index.describe_index_stats(filter={"session_id": self.session_id})
+                return stats.total_vector_count
+            except Exception as e:
+                self.logger.debug(f"Filtered index stats unavailable, counting vector IDs: {e}")
+                self._filtered_stats_supported = False
+        return len(self._session_vector_ids())
+    
+    def _content_hash_from_vector_id(self, vector_id: str) -> str:
+        """Parse the content hash out of a `{session}:{hash}_{chunk_type}_{i}` vector ID"""
+        return vector_id.rsplit(":", 1)[-1].split("_", 1)[0]
+    
     def _load_session_hashes(self):
         """Load existing content hashes for current session only"""
         try:
-            # Query only vectors for this session
-            query_response = self.index.query(
-                vector=[0.0] * self.embedding_dimension,
-                top_k=10000,  # Large number to get all session vectors
-                include_metadata=True,
-                filter={"session_id": self.session_id}
-            )
-            
-            for match in query_response['matches']:
-                if 'content_hash' in match['metadata']:
-                    self._session_content_hashes.add(match['metadata']['content_hash'])
+            for vector_id in self._session_vector_ids():
+                self._session_content_hashes.add(self._content_hash_from_vector_id(vector_id))
             
             self.logger.info(f"Loaded {len(self._session_content_hashes)} existing content hashes for session {self.session_id}")
             
@@ -116,49 +399,135 @@ class IntelligentVectorStore:
             self._session_content_hashes = set()
     
     def _generate_content_hash(self, abstract_text: str, study_id: str) -> str:
-        """Generate unique hash for abstract content (session-scoped)"""
-        # Include session ID in hash for session isolation
-        content = f"{self.session_id}:{study_id}:{abstract_text}"
-        return hashlib.sha256(content.encode()).hexdigest()[:16]
+        """Generate unique hash for abstract content (session-scoped)
+        
+        Stays SHA-256 so hashes match vectors already stored in persistent
+        sessions; hashing one abstract is negligible next to embedding it.
+        """
+        # Include session ID in hash for session isolation. The hasher is
+        # seeded with the session prefix once and copied per abstract, so the
+        # abstract text is hashed in place rather than copied into a new string.
+        hasher = self._session_hasher.copy()
+        hasher.update(f"{study_id}:".encode())
+        hasher.update(abstract_text.encode())
+        return hasher.hexdigest()[:16]
     
     def _sanitize_metadata_for_pinecone(self, metadata_dict: Dict[str, Any]) -> Dict[str, Any]:
-        """Remove None values and sanitize metadata for Pinecone compatibility"""
-        sanitized = {}
-        for key, value in metadata_dict.items():
-            if value is not None:
-                # Convert values to Pinecone-compatible types
-                if isinstance(value, list):
-                    # Filter out None values from lists and convert to strings
-                    clean_list = [str(item) for item in value if item is not None]
-                    if clean_list:  # Only add non-empty lists
-                        sanitized[key] = clean_list
-                elif isinstance(value, (str, int, float, bool)):
-                    sanitized[key] = value
+        """Remove None values and sanitize metadata for Pinecone compatibility (in place)"""
+        for key, value in list(metadata_dict.items()):
+            if value is None:
+                del metadata_dict[key]
+            elif isinstance(value, list):
+                # Filter out None values from lists and convert to strings
+                clean_list = [str(item) for item in value if item is not None]
+                if clean_list:  # Only keep non-empty lists
+                    metadata_dict[key] = clean_list
                 else:
-                    # Convert other types to strings
-                    sanitized[key] = str(value)
-        return sanitized
+                    del metadata_dict[key]
+            elif not isinstance(value, _PINECONE_PRIMITIVES):
+                # Convert other types to strings
+                metadata_dict[key] = str(value)
+        return metadata_dict
     
     async def _get_embedding(self, text: str) -> List[float]:
         """Get embedding for text using OpenAI's large model"""
+        embeddings = await self._get_embeddings_batch([text])
+        return embeddings[0]
+    
+    async def _get_embeddings_batch(self, texts: List[str], max_concurrency: int = 1) -> List[List[float]]:
+        """Get embeddings for many texts, EMBEDDING_BATCH_SIZE per request
+        
+        Embeddings are looked up in the in-memory chunk cache, then the
+        persistent cache; only the remaining distinct texts are sent, with
+        up to max_concurrency requests in flight at once.
+        """
+        texts = [self._truncate_for_embedding(text) for text in texts]
+        
+        # Identical chunk texts (templated summaries, boilerplate) embed once
+        unique_texts = list(dict.fromkeys(texts))
+        keys = {text: xxhash.xxh3_64_hexdigest(text) for text in unique_texts}
+        embeddings: Dict[str, List[float]] = {}
+        for text in unique_texts:
+            cached = self._chunk_embeddings.get(keys[text])
+            if cached is not None:
+                self._chunk_embeddings.move_to_end(keys[text])
+                embeddings[text] = cached.tolist()
+        
+        missing_texts = [text for text in unique_texts if text not in embeddings]
+        if missing_texts and self._embedding_cache is not None:
+            stored = await asyncio.to_thread(self._embedding_cache.get_many, self.embedding_model, missing_texts)
+            for text, embedding in zip(missing_texts, stored):
+                if embedding is not None:
+                    embeddings[text] = embedding
+            missing_texts = [text for text in missing_texts if text not in embeddings]
+        
+        if missing_texts:
+            new_embeddings = await self._request_embeddings(missing_texts, max_concurrency)
+            embeddings.update(zip(missing_texts, new_embeddings))
+            if self._embedding_cache is not None:
+                await asyncio.to_thread(self._embedding_cache.put_many, self.embedding_model, missing_texts, new_embeddings)
+        
+        for text in unique_texts:
+            key = keys[text]
+            if key not in self._chunk_embeddings:
+                self._chunk_embeddings[key] = np.asarray(embeddings[text], dtype=np.float32)
+        while len(self._chunk_embeddings) > CHUNK_EMBEDDING_CACHE_SIZE:
+            self._chunk_embeddings.popitem(last=False)
+        
+        return [embeddings[text] for text in texts]
+    
+    def _truncate_for_embedding(self, text: str) -> str:
+        """Cut text to EMBEDDING_MAX_TOKENS tokens"""
+        # A token covers at least one UTF-8 byte, so short texts need no encoding
+        if self._tokenizer is None or len(text) * 4 <= EMBEDDING_MAX_TOKENS:
+            return text
+        tokens = self._tokenizer.encode(text, disallowed_special=())
+        if len(tokens) <= EMBEDDING_MAX_TOKENS:
+            return text
+        self.logger.warning(f"Truncating {len(tokens)}-token text to {EMBEDDING_MAX_TOKENS} tokens for embedding")
+        return self._tokenizer.decode(tokens[:EMBEDDING_MAX_TOKENS])
+    
+    async def _request_embeddings(self, texts: List[str], max_concurrency: int) -> List[List[float]]:
+        """Embed texts with the OpenAI API"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def embed_slice(start: int) -> List[List[float]]:
+            async with semaphore:
+                response = await asyncio.to_thread(
+                    self.openai_client.embeddings.create,
+                    model=self.embedding_model,
+                    input=texts[start:start + EMBEDDING_BATCH_SIZE]
+                )
+                return [item.embedding for item in response.data]
+        
         try:
-            response = await asyncio.to_thread(
-                self.openai_client.embeddings.create,
-                model=self.embedding_model,
-                input=text
-            )
-            return response.data[0].embedding
+            slices = await asyncio.gather(*[
+                embed_slice(start) for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+            ])
+            return [embedding for embeddings in slices for embedding in embeddings]
         except Exception as e:
-            self.logger.error(f"Error getting embedding: {e}")
+            self.logger.error(f"Error getting batch embeddings: {e}")
             raise
     
-    def _extract_metadata(self, data: ComprehensiveAbstractMetadata, chunk_type: str = "full_abstract") -> VectorMetadata:
+    @staticmethod
+    def _efficacy_tuple(data: ComprehensiveAbstractMetadata) -> Tuple[Any, Any, Any]:
+        """Read (ORR value, PFS median, CR value) from the efficacy outcomes once"""
+        efficacy = data.efficacy_outcomes
+        orr = efficacy.overall_response_rate
+        pfs = efficacy.progression_free_survival
+        cr = efficacy.complete_response_rate
+        return (
+            orr.get('value') if isinstance(orr, dict) else None,
+            pfs.get('median') if isinstance(pfs, dict) else None,
+            cr.get('value') if isinstance(cr, dict) else None
+        )
+    
+    def _extract_metadata(self, data: ComprehensiveAbstractMetadata, chunk_type: str = "full_abstract",
+                          efficacy: Optional[Tuple[Any, Any, Any]] = None) -> VectorMetadata:
         """Extract structured metadata from abstract data"""
         
         # Extract MM subtypes
-        mm_subtypes = []
-        if data.disease_characteristics.mm_subtype:
-            mm_subtypes = [subtype.value for subtype in data.disease_characteristics.mm_subtype]
+        mm_subtypes = list(_subtype_values(tuple(data.disease_characteristics.mm_subtype or ())))
         
         # Extract treatment regimens
         treatment_regimens = []
@@ -167,49 +536,17 @@ class IntelligentVectorStore:
                 treatment_regimens.append(regimen.regimen_name)
         
         # Extract efficacy data
-        orr_value = None
-        if data.efficacy_outcomes.overall_response_rate:
-            orr_data = data.efficacy_outcomes.overall_response_rate
-            if isinstance(orr_data, dict):
-                orr_value = orr_data.get('value')
-        
-        pfs_median = None
-        if data.efficacy_outcomes.progression_free_survival:
-            pfs_data = data.efficacy_outcomes.progression_free_survival
-            if isinstance(pfs_data, dict):
-                pfs_median = pfs_data.get('median')
+        orr_value, pfs_median, _ = efficacy or self._efficacy_tuple(data)
         
         # Generate unique study identifier
         study_id = data.study_identification.nct_number or data.study_identification.study_acronym or data.abstract_id
         content_hash = self._generate_content_hash(data.source_text or "", study_id)
         
-        # Extract cancer type from session ID or metadata
-        cancer_type = "multiple_myeloma"  # Default fallback
-        
-        # Try to extract cancer type from session ID patterns
-        if self.session_id:
-            # Pattern 1: "cancer_prostate_" or "cancer_multiple_myeloma_"
-            if "cancer_" in self.session_id:
-                cancer_type = self.session_id.split("cancer_")[1].split("_")[0]
-            # Pattern 2: "prostate_clean_" or "prostate_batch_"
-            elif "prostate_" in self.session_id:
-                cancer_type = "prostate"
-            # Pattern 3: "multiple_myeloma_" or "mm_"
-            elif "multiple_myeloma_" in self.session_id or "mm_" in self.session_id:
-                cancer_type = "multiple_myeloma"
-            # Pattern 4: Other cancer types
-            elif "breast_" in self.session_id:
-                cancer_type = "breast"
-            elif "lung_" in self.session_id:
-                cancer_type = "lung"
-            elif "colorectal_" in self.session_id:
-                cancer_type = "colorectal"
-        
         return VectorMetadata(
             abstract_id=data.abstract_id,
             content_hash=content_hash,
             session_id=self.session_id,
-            cancer_type=cancer_type,
+            cancer_type=self._cancer_type,
             publication_year=data.study_identification.publication_year,
             study_title=data.study_identification.title,
             study_acronym=data.study_identification.study_acronym,
@@ -226,7 +563,8 @@ class IntelligentVectorStore:
             text_chunk_type=chunk_type
         )
     
-    def _create_text_chunks(self, data: ComprehensiveAbstractMetadata) -> List[Tuple[str, str]]:
+    def _create_text_chunks(self, data: ComprehensiveAbstractMetadata,
+                            efficacy: Optional[Tuple[Any, Any, Any]] = None) -> List[Tuple[str, str]]:
         """Create semantic text chunks for better retrieval"""
         chunks = []
         
@@ -261,46 +599,48 @@ class IntelligentVectorStore:
                         author_chunk = f"Study: {data.study_identification.title}\n{author_text}"
                         chunks.append((author_chunk, "authors_institutions"))
         
+        title = data.study_identification.title
+        
         # Study design summary
-        study_summary = f"""
-        Study: {data.study_identification.title}
-        Type: {data.study_design.study_type.value}
-        Population: {', '.join([s.value for s in data.disease_characteristics.mm_subtype]) if data.disease_characteristics.mm_subtype else 'Multiple Myeloma'}
-        Line of Therapy: {data.treatment_history.line_of_therapy or 'Not specified'}
-        Enrollment: {data.patient_demographics.total_enrolled or 'Not specified'} patients
-        """.strip()
-        chunks.append((study_summary, "study_design"))
+        mm_subtypes = _subtype_values(tuple(data.disease_characteristics.mm_subtype or ()))
+        chunks.append((_STUDY_SUMMARY_TEMPLATE.format_map({
+            'title': title,
+            'study_type': data.study_design.study_type.value,
+            'population': ', '.join(mm_subtypes) if mm_subtypes else 'Multiple Myeloma',
+            'line_of_therapy': data.treatment_history.line_of_therapy or 'Not specified',
+            'enrollment': data.patient_demographics.total_enrolled or 'Not specified'
+        }), "study_design"))
         
         # Treatment information
         if data.treatment_regimens:
-            treatment_text = "Treatment Regimens:\n"
+            treatment_lines = ["Treatment Regimens:"]
             for i, regimen in enumerate(data.treatment_regimens, 1):
-                treatment_text += f"{i}. {regimen.regimen_name}\n"
+                treatment_lines.append(f"{i}. {regimen.regimen_name}")
                 if regimen.drugs:
                     drugs = [f"{drug.get('name', 'Unknown')} ({drug.get('dose', 'Unknown dose')})" 
                             for drug in regimen.drugs]
-                    treatment_text += f"   Drugs: {', '.join(drugs)}\n"
-            chunks.append((treatment_text.strip(), "treatment"))
+                    treatment_lines.append(f"   Drugs: {', '.join(drugs)}")
+            chunks.append(("\n".join(treatment_lines).strip(), "treatment"))
         
         # Efficacy results
-        efficacy_text = f"""
-        Efficacy Results for {data.study_identification.title}:
-        Overall Response Rate: {data.efficacy_outcomes.overall_response_rate.get('value', 'Not reported') if isinstance(data.efficacy_outcomes.overall_response_rate, dict) else 'Not reported'}%
-        Progression-Free Survival: {data.efficacy_outcomes.progression_free_survival.get('median', 'Not reported') if isinstance(data.efficacy_outcomes.progression_free_survival, dict) else 'Not reported'} months
-        Complete Response Rate: {data.efficacy_outcomes.complete_response_rate.get('value', 'Not reported') if isinstance(data.efficacy_outcomes.complete_response_rate, dict) else 'Not reported'}%
-        """.strip()
-        chunks.append((efficacy_text, "efficacy"))
+        orr_value, pfs_median, cr_value = efficacy or self._efficacy_tuple(data)
+        chunks.append((_EFFICACY_TEMPLATE.format_map({
+            'title': title,
+            'orr': _reported(orr_value),
+            'pfs': _reported(pfs_median),
+            'cr': _reported(cr_value)
+        }), "efficacy"))
         
         # Safety information
         if data.safety_profile.grade_3_4_aes:
-            safety_text = f"Safety Profile for {data.study_identification.title}:\n"
+            safety_lines = [f"Safety Profile for {title}:"]
             if isinstance(data.safety_profile.grade_3_4_aes, list):
                 for ae in data.safety_profile.grade_3_4_aes:
                     if isinstance(ae, dict):
                         event = ae.get('event', 'Overall')
                         percentage = ae.get('percentage', 'Unknown')
-                        safety_text += f"Grade 3-4 {event}: {percentage}%\n"
-            chunks.append((safety_text.strip(), "safety"))
+                        safety_lines.append(f"Grade 3-4 {event}: {percentage}%")
+            chunks.append(("\n".join(safety_lines).strip(), "safety"))
         
         return chunks
     
@@ -308,7 +648,8 @@ class IntelligentVectorStore:
         """Embed abstract with smart deduplication"""
         try:
             # Extract metadata
-            base_metadata = self._extract_metadata(data)
+            efficacy = self._efficacy_tuple(data)
+            base_metadata = self._extract_metadata(data, efficacy=efficacy)
             
             # Check for duplicates
             if not force_update and base_metadata.content_hash in self._session_content_hashes:
@@ -321,56 +662,13 @@ class IntelligentVectorStore:
                 }
             
             # Create text chunks for better retrieval
-            text_chunks = self._create_text_chunks(data)
+            text_chunks = self._create_text_chunks(data, efficacy)
+            chunks_to_embed = self._chunks_to_embed(text_chunks)
             
-            # Embed all chunks
-            vectors_to_upsert = []
-            for i, (text, chunk_type) in enumerate(text_chunks):
-                if not text.strip():
-                    continue
-                
-                # Get embedding
-                embedding = await self._get_embedding(text)
-                
-                # Create metadata for this chunk
-                chunk_metadata = self._extract_metadata(data, chunk_type)
-                metadata_dict = chunk_metadata.model_dump()
-                
-                # Add chunk-specific info
-                metadata_dict['text_content'] = text[:1000]  # Store first 1000 chars for preview
-                metadata_dict['chunk_index'] = i
-                
-                # Create vector ID
-                vector_id = f"{base_metadata.content_hash}_{chunk_type}_{i}"
-                
-                vectors_to_upsert.append({
-                    "id": vector_id,
-                    "values": embedding,
-                    "metadata": self._sanitize_metadata_for_pinecone(metadata_dict)
-                })
-            
-            # Upsert vectors
-            if vectors_to_upsert:
-                self.index.upsert(vectors=vectors_to_upsert)
-                
-                # Update cache
-                self._session_content_hashes.add(base_metadata.content_hash)
-                
-                self.logger.info(f"Embedded {len(vectors_to_upsert)} chunks for: {data.study_identification.title}")
-                
-                return {
-                    "status": "success",
-                    "vectors_created": len(vectors_to_upsert),
-                    "content_hash": base_metadata.content_hash,
-                    "study_title": data.study_identification.title,
-                    "chunk_types": [chunk[1] for chunk in text_chunks]
-                }
-            else:
-                return {
-                    "status": "error",
-                    "reason": "no_valid_chunks",
-                    "study_title": data.study_identification.title
-                }
+            # Embed all chunks in one request
+            embeddings = await self._get_embeddings_batch([text for _, text, _ in chunks_to_embed])
+            
+            return await self._upsert_abstract_vectors(data, base_metadata, text_chunks, chunks_to_embed, embeddings)
                 
         except Exception as e:
             self.logger.error(f"Error embedding abstract: {e}")
@@ -380,6 +678,77 @@ class IntelligentVectorStore:
                 "study_title": getattr(data.study_identification, 'title', 'Unknown')
             }
     
+    def _chunks_to_embed(self, text_chunks: List[Tuple[str, str]]) -> List[Tuple[int, str, str]]:
+        """Index, text and type of every non-empty chunk"""
+        return [(i, text, chunk_type) for i, (text, chunk_type) in enumerate(text_chunks) if text.strip()]
+    
+    def _build_abstract_vectors(self, base_metadata: VectorMetadata,
+                                chunks_to_embed: List[Tuple[int, str, str]],
+                                embeddings: List[List[float]]) -> List[Tuple[str, List[float], Dict[str, Any]]]:
+        """Pinecone vectors for the embedded chunks of one abstract
+        
+        Vectors are (id, values, metadata) tuples, which both the REST and
+        gRPC upsert accept without building a dict per vector.
+        """
+        # Chunks share all metadata except their type, so dump and sanitize once
+        abstract_metadata = self._sanitize_metadata_for_pinecone(base_metadata.model_dump())
+        
+        if self._embedding_decimals is not None and embeddings:
+            embeddings = np.round(np.asarray(embeddings, dtype=np.float64), self._embedding_decimals).tolist()
+        
+        vectors = []
+        for (i, text, chunk_type), embedding in zip(chunks_to_embed, embeddings):
+            # Create metadata for this chunk
+            metadata_dict = dict(abstract_metadata)
+            metadata_dict['text_chunk_type'] = chunk_type
+            
+            # Add chunk-specific info
+            metadata_dict['text_content'] = text[:1000]  # Store first 1000 chars for preview
+            metadata_dict['chunk_index'] = i
+            
+            # Create vector ID
+            vector_id = f"{self.session_id}:{base_metadata.content_hash}_{chunk_type}_{i}"
+            
+            vectors.append((vector_id, embedding, metadata_dict))
+        
+        return vectors
+    
+    def _embedding_result(self, data: ComprehensiveAbstractMetadata, base_metadata: VectorMetadata,
+                          text_chunks: List[Tuple[str, str]], vectors_created: int) -> Dict[str, Any]:
+        """Record an abstract whose vectors were upserted and report the outcome"""
+        if vectors_created:
+            # Update cache
+            self._session_content_hashes.add(base_metadata.content_hash)
+            
+            self.logger.info(f"Embedded {vectors_created} chunks for: {data.study_identification.title}")
+            
+            return {
+                "status": "success",
+                "vectors_created": vectors_created,
+                "content_hash": base_metadata.content_hash,
+                "study_title": data.study_identification.title,
+                "chunk_types": [chunk[1] for chunk in text_chunks]
+            }
+        else:
+            return {
+                "status": "error",
+                "reason": "no_valid_chunks",
+                "study_title": data.study_identification.title
+            }
+    
+    async def _upsert_abstract_vectors(self, data: ComprehensiveAbstractMetadata, base_metadata: VectorMetadata,
+                                       text_chunks: List[Tuple[str, str]],
+                                       chunks_to_embed: List[Tuple[int, str, str]],
+                                       embeddings: List[List[float]]) -> Dict[str, Any]:
+        """Upsert the embedded chunks of one abstract and report the outcome"""
+        vectors_to_upsert = self._build_abstract_vectors(base_metadata, chunks_to_embed, embeddings)
+        
+        # Upsert vectors
+        if vectors_to_upsert:
+            await asyncio.to_thread(self.index.upsert, vectors=vectors_to_upsert)
+        
+        return self._embedding_result(data, base_metadata, text_chunks, len(vectors_to_upsert))
+    
     async def search_abstracts(self, query: str, filters: Optional[Dict] = None, top_k: int = 5) -> List[Dict[str, Any]]:
         """Advanced semantic search with filtering - Session isolated"""
         try:
@@ -414,7 +783,8 @@ class IntelligentVectorStore:
             # Search vectors with session filter
             # For comprehensive queries (top_k > 20), get more results to ensure comprehensive coverage
             multiplier = 3 if top_k > 20 else 2
-            search_results = self.index.query(
+            search_results = await asyncio.to_thread(
+                self.index.query,
                 vector=query_embedding,
                 top_k=min(top_k * multiplier, 100),  # Cap at 100 to avoid excessive API calls
                 include_metadata=True,
@@ -466,9 +836,10 @@ class IntelligentVectorStore:
     async def get_study_context(self, study_identifiers: List[str]) -> List[Dict[str, Any]]:
         """Get full context for specific studies - Session isolated"""
         try:
-            results = []
+            semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+            zero_vector = [0.0] * self.embedding_dimension
             
-            for identifier in study_identifiers:
+            async def query_identifier(identifier: str) -> Dict[str, Any]:
                 # Search by NCT number, acronym, or title WITH session filter
                 search_filter = {
                     "session_id": self.session_id,  # Always filter by session
@@ -478,14 +849,22 @@ class IntelligentVectorStore:
                         {"study_title": {"$regex": identifier}}
                     ]
                 }
-                
-                query_results = self.index.query(
-                    vector=[0.0] * self.embedding_dimension,
-                    top_k=10,
-                    include_metadata=True,
-                    filter=search_filter
-                )
-                
+                async with semaphore:
+                    return await asyncio.to_thread(
+                        self.index.query,
+                        vector=zero_vector,
+                        top_k=10,
+                        include_metadata=True,
+                        filter=search_filter
+                    )
+            
+            # One query per identifier, issued concurrently
+            all_query_results = await asyncio.gather(
+                *[query_identifier(identifier) for identifier in study_identifiers]
+            )
+            
+            results = []
+            for query_results in all_query_results:
                 # Group chunks by study
                 study_chunks = {}
                 for match in query_results['matches']:
@@ -519,14 +898,7 @@ class IntelligentVectorStore:
         """Get vector store statistics for current session"""
         try:
             # Get session-specific stats
-            session_query = self.index.query(
-                vector=[0.0] * self.embedding_dimension,
-                top_k=10000,
-                include_metadata=True,
-                filter={"session_id": self.session_id}
-            )
-            
-            session_vectors = len(session_query['matches'])
+            session_vectors = self._session_vector_count()
             unique_studies = len(self._session_content_hashes)
             
             return {
@@ -550,26 +922,37 @@ class IntelligentVectorStore:
         """Clear all data for current session"""
         try:
             # Get all vectors for this session
-            session_vectors = self.index.query(
-                vector=[0.0] * self.embedding_dimension,
-                top_k=10000,
-                include_metadata=True,
-                filter={"session_id": self.session_id}
-            )
+            vector_ids = await asyncio.to_thread(self._session_vector_ids)
             
-            # Delete vectors
-            if session_vectors['matches']:
-                vector_ids = [match['id'] for match in session_vectors['matches']]
-                self.index.delete(ids=vector_ids)
+            # Delete vectors, 1000 IDs per request. Serverless indexes do not
+            # support deleting by metadata filter, so IDs are required.
+            semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+            
+            async def delete_slice(ids: List[str], start: int) -> None:
+                async with semaphore:
+                    await asyncio.to_thread(self.index.delete, ids=ids[start:start + 1000])
+            
+            vectors_deleted = 0
+            while vector_ids:
+                await asyncio.gather(*[delete_slice(vector_ids, start) for start in range(0, len(vector_ids), 1000)])
+                vectors_deleted += len(vector_ids)
                 
+                # Listing returns every ID at once; the filtered query on pod
+                # indexes stops at SESSION_QUERY_TOP_K, so query again after
+                # each full page until the session is empty
+                if self._id_listing_supported or len(vector_ids) < SESSION_QUERY_TOP_K:
+                    break
+                vector_ids = await asyncio.to_thread(self._queried_session_vector_ids)
+            
+            if vectors_deleted:
                 # Clear session cache
                 self._session_content_hashes.clear()
                 
-                self.logger.info(f"Cleared {len(vector_ids)} vectors for session {self.session_id}")
+                self.logger.info(f"Cleared {vectors_deleted} vectors for session {self.session_id}")
                 
                 return {
                     "status": "success",
-                    "vectors_deleted": len(vector_ids),
+                    "vectors_deleted": vectors_deleted,
                     "session_id": self.session_id
                 }
             else:
@@ -592,8 +975,14 @@ class IntelligentVectorStore:
         """Get current session ID"""
         return self.session_id
     
-    async def batch_embed_abstracts(self, abstracts: List[ComprehensiveAbstractMetadata]) -> Dict[str, Any]:
-        """Batch embed multiple abstracts efficiently"""
+    async def batch_embed_abstracts(self, abstracts: List[ComprehensiveAbstractMetadata],
+                                    max_concurrency: int = 16) -> Dict[str, Any]:
+        """Batch embed multiple abstracts efficiently
+        
+        All chunks are embedded together with at most max_concurrency
+        requests in flight, then upserted across abstracts in full-size
+        Pinecone requests, UPSERT_CONCURRENCY at a time.
+        """
         results = {
             "success": 0,
             "skipped": 0,
@@ -601,24 +990,102 @@ class IntelligentVectorStore:
             "details": []
         }
         
-        for abstract in abstracts:
+        details: List[Optional[Dict[str, Any]]] = [None] * len(abstracts)
+        
+        # Collect the chunks of every new abstract so they embed together
+        pending = []
+        all_texts = []
+        batch_hashes = set()
+        for position, abstract in enumerate(abstracts):
             try:
-                result = await self.embed_abstract(abstract)
-                results["details"].append(result)
+                efficacy = self._efficacy_tuple(abstract)
+                base_metadata = self._extract_metadata(abstract, efficacy=efficacy)
+                content_hash = base_metadata.content_hash
+                if content_hash in self._session_content_hashes or content_hash in batch_hashes:
+                    self.logger.info(f"Abstract already embedded: {abstract.study_identification.title}")
+                    details[position] = {
+                        "status": "skipped",
+                        "reason": "already_exists",
+                        "content_hash": content_hash,
+                        "study_title": abstract.study_identification.title
+                    }
+                    continue
+                batch_hashes.add(content_hash)
                 
-                if result["status"] == "success":
-                    results["success"] += 1
-                elif result["status"] == "skipped":
-                    results["skipped"] += 1
-                else:
-                    results["errors"] += 1
-                    
+                text_chunks = self._create_text_chunks(abstract, efficacy)
+                chunks_to_embed = self._chunks_to_embed(text_chunks)
+                pending.append((position, abstract, base_metadata, text_chunks, chunks_to_embed, len(all_texts)))
+                all_texts.extend(text for _, text, _ in chunks_to_embed)
             except Exception as e:
-                results["errors"] += 1
-                results["details"].append({
+                details[position] = {
                     "status": "error",
                     "reason": str(e),
                     "study_title": getattr(abstract.study_identification, 'title', 'Unknown')
-                })
+                }
+        
+        try:
+            all_embeddings = await self._get_embeddings_batch(all_texts, max_concurrency)
+        except Exception as e:
+            all_embeddings = None
+            embedding_error = str(e)
+        
+        # Build every abstract's vectors, remembering which abstract owns each
+        all_vectors = []
+        vector_owners = []
+        built = []
+        for position, abstract, base_metadata, text_chunks, chunks_to_embed, offset in pending:
+            try:
+                if all_embeddings is None:
+                    raise RuntimeError(embedding_error)
+                embeddings = all_embeddings[offset:offset + len(chunks_to_embed)]
+                vectors = self._build_abstract_vectors(base_metadata, chunks_to_embed, embeddings)
+            except Exception as e:
+                details[position] = {
+                    "status": "error",
+                    "reason": str(e),
+                    "study_title": getattr(abstract.study_identification, 'title', 'Unknown')
+                }
+                continue
+            built.append((position, abstract, base_metadata, text_chunks, len(vectors)))
+            all_vectors.extend(vectors)
+            vector_owners.extend([position] * len(vectors))
+        
+        # Upsert across abstracts in full-size requests, several in flight
+        semaphore = asyncio.Semaphore(UPSERT_CONCURRENCY)
+        batch_size = self._upsert_batch_size
+        
+        async def upsert_slice(start: int) -> None:
+            async with semaphore:
+                await asyncio.to_thread(self.index.upsert, vectors=all_vectors[start:start + batch_size])
+        
+        starts = range(0, len(all_vectors), batch_size)
+        outcomes = await asyncio.gather(*[upsert_slice(start) for start in starts], return_exceptions=True)
+        
+        failed_positions = {}
+        for start, outcome in zip(starts, outcomes):
+            if isinstance(outcome, Exception):
+                self.logger.error(f"Error upserting vectors: {outcome}")
+                for position in vector_owners[start:start + batch_size]:
+                    failed_positions[position] = str(outcome)
+        
+        for position, abstract, base_metadata, text_chunks, vectors_created in built:
+            if position in failed_positions:
+                details[position] = {
+                    "status": "error",
+                    "reason": failed_positions[position],
+                    "study_title": getattr(abstract.study_identification, 'title', 'Unknown')
+                }
+            else:
+                details[position] = self._embedding_result(abstract, base_metadata, text_chunks, vectors_created)
+        
+        for result in details:
+            results["details"].append(result)
+            
+            if result["status"] == "success":
+                results["success"] += 1
+            elif result["status"] == "skipped":
+                results["skipped"] += 1
+            else:
+                results["errors"] += 1
         
-        return results 
\ No newline at end of file
+        return results
@@ -1,28 +1,260 @@
 # agents/visualizer.py - REWRITTEN INTERACTIVE VISUALIZATIONS
 
 import plotly.graph_objects as go
-import plotly.express as px
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 import math
 import logging
-from typing import Dict, List, Any, Optional, Union
-from collections import Counter, defaultdict
-import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+from collections import defaultdict
+from collections.abc import Mapping
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+try:
+    import streamlit as st
+except ImportError:
+    st = None  # Headless use, e.g. batch figure export
+import xxhash
 
 # Import your metadata models
-from models.abstract_metadata import (
-    ComprehensiveAbstractMetadata, StudyType, MMSubtype
+from models.abstract_metadata import ComprehensiveAbstractMetadata
+
+def _sum_ae_rates(ae_rows: List[Optional[List[float]]]) -> np.ndarray:
+    """Total grade 3-4 AE rate per study
+    
+    Rows are packed into a NaN-padded matrix and summed in one NumPy
+    reduction; studies without AE data (None rows) stay NaN.
+    """
+    width = max((len(row) for row in ae_rows if row), default=0) or 1
+    ae_pct = np.full((len(ae_rows), width), np.nan)
+    has_data = np.zeros(len(ae_rows), dtype=bool)
+    for i, row in enumerate(ae_rows):
+        if row is not None:
+            ae_pct[i, :len(row)] = row
+            has_data[i] = True
+    
+    totals = np.nansum(ae_pct, axis=1)
+    totals[~has_data] = np.nan
+    return totals
+
+
+def _fd_bin_count(values: List[float], min_bins: int = 5, max_bins: int = 30) -> int:
+    """Freedman-Diaconis bin count, clamped to [min_bins, max_bins]"""
+    x = np.asarray(values, dtype=float)
+    q75, q25 = np.percentile(x, [75, 25])
+    bin_width = 2 * (q75 - q25) / len(x) ** (1 / 3)
+    if bin_width <= 0:
+        return min_bins
+    return int(max(min_bins, min(max_bins, np.ceil((x.max() - x.min()) / bin_width))))
+
+
+def _coerce_rate(value: Any) -> float:
+    """Numeric rate as a float, NaN when missing or not a number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return np.nan
+
+
+# Numeric columns of the flattened metadata. Rates and demographics fit in
+# float32; enrollment stays float64 so patient totals remain exact and
+# missing values can still be NaN
+NUMERIC_COLUMN_DTYPES = {
+    'total_enrolled': 'float64',
+    'median_age': 'float32',
+    'male_pct': 'float32',
+    'orr': 'float32',
+    'disc_rate': 'float32',
+    'ae_rate': 'float32',
+}
+
+# Scatter charts with more points than this render through WebGL; smaller
+# ones stay SVG, which draws sharper markers
+WEBGL_POINT_THRESHOLD = 200
+
+# Threads building dashboard charts concurrently; the NumPy and pandas
+# aggregations release the GIL
+DASHBOARD_BUILD_WORKERS = 8
+
+# Bubble charts with more points than this are sent as a binned density
+# heatmap, DENSITY_BINS x DENSITY_BINS cells over the 0-100% range
+DENSITY_POINT_THRESHOLD = 5000
+DENSITY_BINS = 200
+
+
+# Logical order of study phases on the phase chart
+PHASE_ORDER = ('Phase 1', 'Phase 1/2', 'Phase 2', 'Phase 3', 'Phase 4', 'Real World Study')
+
+# Keywords identifying each novel agent class in study titles and regimens
+NOVEL_AGENT_KEYWORDS = {
+    'CAR-T': ['car-t', 'cart', 'ciltacabtagene', 'idecabtagene', 'cilta-cel', 'ide-cel'],
+    'Bispecific': ['bispecific', 'teclistamab', 'talquetamab', 'elranatamab'],
+    'ADC': ['belantamab', 'mafodotin', 'adc', 'antibody-drug'],
+    'BCL-2': ['venetoclax', 'bcl-2', 'bcl2'],
+    'SINE': ['selinexor', 'sine', 'exportin'],
+    'HDAC': ['panobinostat', 'hdac', 'histone deacetylase']
+}
+
+# Study size buckets, smallest first
+STUDY_SIZE_CATEGORIES = ("Small (<30)", "Medium (30-99)", "Large (100-299)", "Very Large (≥300)")
+STUDY_SIZE_BIN_EDGES = np.array([30, 100, 300])
+
+# Dashboard charts combined into the single overview figure: key, panel
+# title and subplot type, laid out two per row
+OVERVIEW_PANELS = (
+    ('phase_distribution', "Study Phases", 'xy'),
+    ('mm_subtype_distribution', "MM Subtypes", 'domain'),
+    ('treatment_landscape', "Top Treatment Regimens", 'xy'),
+    ('novel_agents_adoption', "Novel Agent Adoption (%)", 'xy'),
+    ('efficacy_analysis', "ORR by MM Subtype", 'xy'),
+    ('response_rates_by_line', "ORR by Line of Therapy", 'xy'),
+    ('safety_analysis', "Grade 3-4 AEs vs Discontinuations", 'xy'),
+    ('study_size_distribution', "Study Size", 'xy'),
 )
 
+# MM subtype label fragments and their palette keys, checked in order
+_SUBTYPE_COLOR_RULES = (
+    (('RRMM', 'Relapsed'), 'rrmm'),
+    (('Newly Diagnosed', 'NDMM'), 'ndmm'),
+    (('Smoldering',), 'smoldering'),
+    (('Amyloidosis',), 'amyloidosis'),
+)
+
+
+@lru_cache(maxsize=None)
+def _subtype_color_key(label: str) -> str:
+    """Palette key for an MM subtype label"""
+    for fragments, color_key in _SUBTYPE_COLOR_RULES:
+        if any(fragment in label for fragment in fragments):
+            return color_key
+    return 'default'
+
+
+# Line of therapy fragments (matched against the lowercased label) and the
+# line they map to, checked in order
+_LINE_OF_THERAPY_RULES = (
+    (('first', '1'), "First Line"),
+    (('second', '2'), "Second Line"),
+    (('third', '3'), "Third Line"),
+    (('fourth', '4'), "Fourth+ Line"),
+)
+
+
+@lru_cache(maxsize=None)
+def _line_of_therapy_key(label: str) -> str:
+    """Normalized line of therapy for a free-text label"""
+    lowered = label.lower()
+    for fragments, line_key in _LINE_OF_THERAPY_RULES:
+        if any(fragment in lowered for fragment in fragments):
+            return line_key
+    return "Other"
+
+
+@lru_cache(maxsize=1)
+def _novel_agent_automaton() -> Optional["ahocorasick.Automaton"]:
+    """Aho-Corasick automaton mapping each novel agent keyword to its class index"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for index, keywords in enumerate(NOVEL_AGENT_KEYWORDS.values()):
+        for keyword in keywords:
+            automaton.add_word(keyword, index)
+    automaton.make_automaton()
+    return automaton
+
+
+@lru_cache(maxsize=4096)
+def _novel_agent_mask(study_text: str) -> int:
+    """Bit mask of the novel agent classes mentioned in lowercased study text
+    
+    One automaton pass finds every keyword; without pyahocorasick each class
+    falls back to substring checks. Masks are memoized on the text, so
+    studies unchanged between dashboard rebuilds are not scanned again.
+    """
+    automaton = _novel_agent_automaton()
+    mask = 0
+    if automaton is not None:
+        for _, index in automaton.iter(study_text):
+            mask |= 1 << index
+        return mask
+    for index, keywords in enumerate(NOVEL_AGENT_KEYWORDS.values()):
+        if any(keyword in study_text for keyword in keywords):
+            mask |= 1 << index
+    return mask
+
+
+def _cached_dashboard(fingerprint: str, theme: str, _visualizer: "AdvancedVisualizer",
+                      _metadata_list: List[ComprehensiveAbstractMetadata]) -> Dict[str, go.Figure]:
+    """Dashboard figures memoized on the metadata fingerprint and chart theme
+    
+    The underscore arguments are excluded from Streamlit's cache key, so
+    unchanged metadata skips both hashing the models and rebuilding figures.
+    Without Streamlit installed the figures are rebuilt on every call.
+    """
+    return _visualizer._build_dashboard(_metadata_list)
+
+
+if st is not None:
+    _cached_dashboard = st.cache_data(show_spinner=False, max_entries=16)(_cached_dashboard)
+
+
+def _metadata_fingerprint(metadata_list: List[ComprehensiveAbstractMetadata]) -> str:
+    """Content hash of a metadata list"""
+    hasher = xxhash.xxh3_128()
+    for m in metadata_list:
+        hasher.update(m.model_dump_json().encode())
+    return hasher.hexdigest()
+
+
+class LazyDashboard(Mapping):
+    """Read-only mapping of chart name to figure, built on first access"""
+    
+    def __init__(self, visualizer: "AdvancedVisualizer", df: pd.DataFrame,
+                 builders: Dict[str, Tuple[Callable[[pd.DataFrame], go.Figure], str]]):
+        self._visualizer = visualizer
+        self._df = df
+        self._builders = builders
+        self._figures: Dict[str, go.Figure] = {}
+    
+    def __getitem__(self, key: str) -> go.Figure:
+        if key not in self._figures:
+            builder, title = self._builders[key]
+            self._figures[key] = self._visualizer._safe_build(title, builder, self._df)
+        return self._figures[key]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._builders)
+    
+    def __len__(self) -> int:
+        return len(self._builders)
+
+
 class AdvancedVisualizer:
     """Create interactive, publication-quality visualizations from extracted metadata"""
     
     def __init__(self, db_client=None):
         self.db = db_client
         self.color_palette = self._define_medical_color_palette()
+        self._phase_colors = {
+            phase: self._get_color(f'phase{phase.split()[-1].replace("/", "")}'.lower())
+            for phase in PHASE_ORDER
+        }
+        # Per-chart color sequences, resolved once
+        self._novel_agent_colors = [
+            self._get_color(key) for key in ('car_t', 'bispecific', 'adc', 'primary', 'secondary', 'warning')
+        ]
+        self._line_colors = [self._get_color(key) for key in ('success', 'primary', 'warning', 'danger')]
+        self._study_size_colors = [self._get_color(key) for key in ('danger', 'warning', 'primary', 'success')]
         self.theme = self._get_safe_theme()
+        self._error_layout, self._empty_layout = self._placeholder_layouts()
+        # Figures pick up the theme as the default template rather than each
+        # merging it into its own layout
+        pio.templates.default = self.theme
         self.logger = logging.getLogger(__name__)
         
     def _get_safe_theme(self) -> str:
@@ -87,27 +319,53 @@ class AdvancedVisualizer:
         """Safely get color with fallback"""
         return self.color_palette.get(key, self.color_palette['default'])
     
+    def _figure(self, data: List[Dict[str, Any]], **layout: Any) -> go.Figure:
+        """Figure built and validated in one pass from trace and layout dicts"""
+        return go.Figure({'data': data, 'layout': layout})
+    
+    def _placeholder_layouts(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Layout prototypes for the error and empty figures
+        
+        Only the title and annotation text vary, so each placeholder is a
+        copy of a prototype built once per visualizer.
+        """
+        error_layout = {
+            'height': 400,
+            'annotations': [{
+                'xref': "paper", 'yref': "paper",
+                'x': 0.5, 'y': 0.5, 'showarrow': False,
+                'font': {'size': 16, 'color': self._get_color('danger')},
+                'bgcolor': "rgba(255, 0, 0, 0.1)",
+                'bordercolor': self._get_color('danger'),
+                'borderwidth': 2
+            }]
+        }
+        empty_layout = {
+            'height': 400,
+            'annotations': [{
+                'xref': "paper", 'yref': "paper",
+                'x': 0.5, 'y': 0.5, 'showarrow': False,
+                'font': {'size': 16, 'color': self._get_color('default')},
+                'bgcolor': self._get_color('background'),
+                'bordercolor': self._get_color('default'),
+                'borderwidth': 1
+            }]
+        }
+        return error_layout, empty_layout
+    
+    @staticmethod
+    def _placeholder_figure(prototype: Dict[str, Any], title: str, text: str) -> go.Figure:
+        """Figure from a placeholder prototype with its title and message filled in"""
+        layout = dict(prototype, title=title, annotations=[dict(prototype['annotations'][0], text=text)])
+        return go.Figure({'layout': layout})
+    
     def _create_error_figure(self, title: str, error_message: str) -> go.Figure:
         """Create error figure with debugging info"""
-        fig = go.Figure()
-        
-        fig.add_annotation(
-            text=f"⚠️ Error in {title}<br><br>Details: {error_message}<br><br>Check data structure and logs",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color=self._get_color('danger')),
-            bgcolor="rgba(255, 0, 0, 0.1)",
-            bordercolor=self._get_color('danger'),
-            borderwidth=2
+        return self._placeholder_figure(
+            self._error_layout,
+            f"Error: {title}",
+            f"⚠️ Error in {title}<br><br>Details: {error_message}<br><br>Check data structure and logs"
         )
-        
-        fig.update_layout(
-            title=f"Error: {title}",
-            template=self.theme,
-            height=400
-        )
-        
-        return fig
     
     def _create_empty_figure(self, title: str, message: str = None) -> go.Figure:
         """Create empty figure with helpful message"""
@@ -118,26 +376,71 @@ class AdvancedVisualizer:
             "• Insufficient studies in dataset<br>"
             "• Filters applied removed all data"
         )
+        return self._placeholder_figure(self._empty_layout, title, message or default_message)
+    
+    def _flatten_metadata(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> pd.DataFrame:
+        """Flatten the fields every chart needs into one DataFrame, one row per study
         
-        fig = go.Figure()
-        
-        fig.add_annotation(
-            text=message or default_message,
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color=self._get_color('default')),
-            bgcolor=self._get_color('background'),
-            bordercolor=self._get_color('default'),
-            borderwidth=1
-        )
-        
-        fig.update_layout(
-            title=title,
-            template=self.theme,
-            height=400
-        )
+        The nested metadata models are walked once here; the chart builders
+        only read columns. Missing numeric fields are NaN.
+        """
+        columns = defaultdict(list)
+        ae_rows = []
         
-        return fig
+        for m in metadata_list:
+            title = m.study_identification.title
+            study_type = m.study_design.study_type
+            demographics = m.patient_demographics
+            safety = m.safety_profile
+            treatment_regimens = m.treatment_regimens
+            mm_subtypes = [subtype.value for subtype in m.disease_characteristics.mm_subtype or []]
+            regimens = [r.regimen_name for r in treatment_regimens if r.regimen_name]
+            
+            columns['title'].append(title)
+            columns['study_type'].append(study_type.value if study_type else None)
+            columns['mm_subtypes_all'].append(mm_subtypes)
+            columns['mm_subtype_primary'].append(mm_subtypes[0] if mm_subtypes else "Unknown")
+            columns['total_enrolled'].append(demographics.total_enrolled or np.nan)
+            columns['median_age'].append(demographics.median_age or np.nan)
+            columns['male_pct'].append(demographics.male_percentage or np.nan)
+            columns['line_of_therapy'].append(m.treatment_history.line_of_therapy or None)
+            columns['regimens_all'].append(regimens)
+            # Lowercased title and regimen names, the text keyword matching runs on
+            columns['study_text'].append(" ".join([title, *regimens]).lower())
+            columns['regimen_primary'].append(
+                (treatment_regimens[0].regimen_name or "Unknown") if treatment_regimens else "Unknown"
+            )
+            
+            # ORR: dict with value/rate, or a bare number
+            orr_data = m.efficacy_outcomes.overall_response_rate
+            if isinstance(orr_data, dict):
+                orr_data = orr_data.get('value') or orr_data.get('rate')
+            columns['orr'].append(_coerce_rate(orr_data))
+            
+            # Grade 3-4 AEs: list of events with percentages, dict with a total, or a bare number
+            ae_data = safety.grade_3_4_aes
+            if not ae_data:
+                ae_rows.append(None)
+            elif isinstance(ae_data, list):
+                ae_rows.append([_coerce_rate(ae.get('percentage')) for ae in ae_data if isinstance(ae, dict)])
+            elif isinstance(ae_data, dict):
+                ae_rows.append([_coerce_rate(ae_data.get('total_rate', 0))])
+            else:
+                ae_rows.append([_coerce_rate(ae_data)])
+            
+            disc_data = safety.discontinuations
+            if isinstance(disc_data, dict):
+                disc_data = disc_data.get('total', 0) or disc_data.get('rate', 0)
+            disc_rate = _coerce_rate(disc_data)
+            columns['disc_rate'].append(0.0 if math.isnan(disc_rate) else disc_rate)
+        
+        columns['ae_rate'] = _sum_ae_rates(ae_rows)
+        df = pd.DataFrame(columns).astype(NUMERIC_COLUMN_DTYPES)
+        
+        # Hover titles, cut to 50 characters
+        titles = df['title'].astype(str)
+        df['title_short'] = titles.where(titles.str.len() <= 50, titles.str.slice(0, 50) + "...")
+        return df
     
     def create_comprehensive_dashboard(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> Dict[str, go.Figure]:
         """Create comprehensive visualization suite from metadata list"""
@@ -150,106 +453,82 @@ class AdvancedVisualizer:
                 'patient_demographics', 'temporal_trends', 'competitive_analysis'
             ]}
         
-        self.logger.info(f"Creating dashboard for {len(metadata_list)} studies")
-        
-        visualizations = {}
-        
-        # Study Overview Section
-        try:
-            visualizations['study_overview'] = self._create_study_overview_dashboard(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating study overview: {e}")
-            visualizations['study_overview'] = self._create_error_figure("Study Overview", str(e))
-        
-        try:
-            visualizations['mm_subtype_distribution'] = self._create_mm_subtype_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating MM subtype chart: {e}")
-            visualizations['mm_subtype_distribution'] = self._create_error_figure("MM Subtype Distribution", str(e))
-        
-        try:
-            visualizations['phase_distribution'] = self._create_phase_distribution_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating phase distribution: {e}")
-            visualizations['phase_distribution'] = self._create_error_figure("Phase Distribution", str(e))
-        
-        # Treatment Analysis Section
-        try:
-            visualizations['treatment_landscape'] = self._create_treatment_landscape_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating treatment landscape: {e}")
-            visualizations['treatment_landscape'] = self._create_error_figure("Treatment Landscape", str(e))
-        
-        try:
-            visualizations['novel_agents_adoption'] = self._create_novel_agents_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating novel agents chart: {e}")
-            visualizations['novel_agents_adoption'] = self._create_error_figure("Novel Agents Adoption", str(e))
-        
-        # Efficacy Analysis Section
-        try:
-            visualizations['efficacy_analysis'] = self._create_efficacy_analysis_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating efficacy analysis: {e}")
-            visualizations['efficacy_analysis'] = self._create_error_figure("Efficacy Analysis", str(e))
-        
-        try:
-            visualizations['response_rates_by_line'] = self._create_response_rates_by_line_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating response rates chart: {e}")
-            visualizations['response_rates_by_line'] = self._create_error_figure("Response Rates by Line", str(e))
-        
-        # Safety Analysis Section
-        try:
-            visualizations['safety_analysis'] = self._create_safety_analysis_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating safety analysis: {e}")
-            visualizations['safety_analysis'] = self._create_error_figure("Safety Analysis", str(e))
-        
-        # Patient Demographics Section
-        try:
-            visualizations['patient_demographics'] = self._create_patient_demographics_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating patient demographics: {e}")
-            visualizations['patient_demographics'] = self._create_error_figure("Patient Demographics", str(e))
+        # Reruns with unchanged metadata reuse the cached figures
+        return _cached_dashboard(_metadata_fingerprint(metadata_list), self.theme, self, metadata_list)
+    
+    def _build_dashboard(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> Dict[str, go.Figure]:
+        """Build every dashboard figure from a non-empty metadata list
+        
+        The chart builders only read the shared flattened DataFrame, so they
+        run concurrently on a thread pool.
+        """
+        dashboard = self.create_lazy_dashboard(metadata_list)
+        with ThreadPoolExecutor(max_workers=min(DASHBOARD_BUILD_WORKERS, len(dashboard))) as executor:
+            figures = list(executor.map(dashboard.__getitem__, dashboard))
+        visualizations = dict(zip(dashboard, figures))
+        self.logger.info(f"Dashboard created with {len(visualizations)} visualizations")
+        return visualizations
+    
+    def create_lazy_dashboard(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> "LazyDashboard":
+        """Dashboard whose figures are built on first access
+        
+        Views that show one chart at a time only pay for that chart; the
+        metadata is still flattened once up front. An empty list maps every
+        chart to the "No Studies Available" placeholder.
+        """
+        builders = self._dashboard_builders()
+        if not metadata_list:
+            empty_fig = self._create_empty_figure("No Studies Available", "No metadata provided for visualization")
+            return LazyDashboard(self, pd.DataFrame(), {
+                key: (lambda _df: empty_fig, title) for key, (_, title) in builders.items()
+            })
         
-        # Advanced Analytics
-        try:
-            visualizations['efficacy_safety_bubble'] = self._create_efficacy_safety_bubble_chart(metadata_list)
-        except Exception as e:
-            self.logger.error(f"Error creating efficacy-safety bubble: {e}")
-            visualizations['efficacy_safety_bubble'] = self._create_error_figure("Efficacy-Safety Analysis", str(e))
+        self.logger.info(f"Creating dashboard for {len(metadata_list)} studies")
         
+        # Walk the metadata once; every chart reads from this frame
+        df = self._flatten_metadata(metadata_list)
+        return LazyDashboard(self, df, builders)
+    
+    def _dashboard_builders(self) -> Dict[str, Tuple[Callable[[pd.DataFrame], go.Figure], str]]:
+        """Dashboard chart key -> (builder taking the flattened frame, title)"""
+        return {
+            # Study Overview Section
+            'study_overview': (self._create_study_overview_dashboard, "Study Overview"),
+            'mm_subtype_distribution': (self._create_mm_subtype_chart, "MM Subtype Distribution"),
+            'phase_distribution': (self._create_phase_distribution_chart, "Phase Distribution"),
+            # Treatment Analysis Section
+            'treatment_landscape': (self._create_treatment_landscape_chart, "Treatment Landscape"),
+            'novel_agents_adoption': (self._create_novel_agents_chart, "Novel Agents Adoption"),
+            # Efficacy Analysis Section
+            'efficacy_analysis': (self._create_efficacy_analysis_chart, "Efficacy Analysis"),
+            'response_rates_by_line': (self._create_response_rates_by_line_chart, "Response Rates by Line"),
+            # Safety Analysis Section
+            'safety_analysis': (self._create_safety_analysis_chart, "Safety Analysis"),
+            # Patient Demographics Section
+            'patient_demographics': (self._create_patient_demographics_chart, "Patient Demographics"),
+            # Advanced Analytics
+            'efficacy_safety_bubble': (self._create_efficacy_safety_bubble_chart, "Efficacy-Safety Analysis"),
+            'study_size_distribution': (self._create_study_size_distribution, "Study Size Distribution"),
+        }
+    
+    def _safe_build(self, title: str, builder: Callable[[pd.DataFrame], go.Figure], df: pd.DataFrame) -> go.Figure:
+        """Build one chart, falling back to an error figure"""
         try:
-            visualizations['study_size_distribution'] = self._create_study_size_distribution(metadata_list)
+            return builder(df)
         except Exception as e:
-            self.logger.error(f"Error creating study size distribution: {e}")
-            visualizations['study_size_distribution'] = self._create_error_figure("Study Size Distribution", str(e))
-        
-        self.logger.info(f"Dashboard created with {len(visualizations)} visualizations")
-        return visualizations
+            self.logger.error(f"Error creating {title}: {e}")
+            return self._create_error_figure(title, str(e))
     
-    def _create_study_overview_dashboard(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _create_study_overview_dashboard(self, df: pd.DataFrame) -> go.Figure:
         """Create comprehensive study overview with key metrics"""
         
         # Calculate key metrics
-        total_studies = len(metadata_list)
-        total_patients = sum([
-            m.patient_demographics.total_enrolled or 0 
-            for m in metadata_list
-        ])
+        total_studies = len(df)
+        total_patients = int(df['total_enrolled'].sum())
         
-        # Extract study types
-        study_types = [m.study_design.study_type.value for m in metadata_list if m.study_design.study_type]
-        study_type_counts = Counter(study_types)
-        
-        # Extract MM subtypes (flatten nested lists)
-        mm_subtypes = []
-        for m in metadata_list:
-            if m.disease_characteristics.mm_subtype:
-                for subtype in m.disease_characteristics.mm_subtype:
-                    mm_subtypes.append(subtype.value)
-        mm_subtype_counts = Counter(mm_subtypes)
+        # Count study types and MM subtypes (flatten nested lists)
+        study_type_counts = df['study_type'].value_counts()
+        mm_subtype_counts = df['mm_subtypes_all'].explode().dropna().value_counts()
         
         # Create subplots - simplified to just 2 charts
         fig = make_subplots(
@@ -262,9 +541,9 @@ class AdvancedVisualizer:
         )
         
         # Study phase pie chart
-        if study_type_counts:
-            phases = list(study_type_counts.keys())
-            counts = list(study_type_counts.values())
+        if not study_type_counts.empty:
+            phases = study_type_counts.index.tolist()
+            counts = study_type_counts.tolist()
             colors = [self._get_color(f'phase{i+1}') for i in range(len(phases))]
             
             fig.add_trace(
@@ -280,9 +559,9 @@ class AdvancedVisualizer:
             )
         
         # MM subtype bar chart
-        if mm_subtype_counts:
-            subtypes = list(mm_subtype_counts.keys())
-            subtype_counts = list(mm_subtype_counts.values())
+        if not mm_subtype_counts.empty:
+            subtypes = mm_subtype_counts.index.tolist()
+            subtype_counts = mm_subtype_counts.tolist()
             colors = [self._get_color(subtype.lower().replace(' ', '_')) for subtype in subtypes]
             
             fig.add_trace(
@@ -301,46 +580,28 @@ class AdvancedVisualizer:
         fig.update_layout(
             title=f"📊 Study Overview Dashboard - {total_studies} Studies, {total_patients:,} Patients",
             height=500,
-            showlegend=True,
-            template=self.theme
+            showlegend=True
         )
         
         return fig
     
-    def _create_mm_subtype_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _create_mm_subtype_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create detailed MM subtype distribution"""
         
-        # Extract MM subtypes
-        mm_subtypes = []
-        for m in metadata_list:
-            if m.disease_characteristics.mm_subtype:
-                for subtype in m.disease_characteristics.mm_subtype:
-                    mm_subtypes.append(subtype.value)
+        # Count MM subtypes
+        subtype_counts = df['mm_subtypes_all'].explode().dropna().value_counts()
         
-        if not mm_subtypes:
+        if subtype_counts.empty:
             return self._create_empty_figure("MM Subtype Distribution", "No MM subtype data available")
         
-        subtype_counts = Counter(mm_subtypes)
-        total = sum(subtype_counts.values())
+        total = int(subtype_counts.sum())
         
         # Create enhanced pie chart
-        labels = list(subtype_counts.keys())
-        values = list(subtype_counts.values())
-        percentages = [v/total*100 for v in values]
+        labels = subtype_counts.index.tolist()
+        values = subtype_counts.tolist()
         
         # Map subtypes to colors
-        colors = []
-        for label in labels:
-            if 'RRMM' in label or 'Relapsed' in label:
-                colors.append(self._get_color('rrmm'))
-            elif 'Newly Diagnosed' in label or 'NDMM' in label:
-                colors.append(self._get_color('ndmm'))
-            elif 'Smoldering' in label:
-                colors.append(self._get_color('smoldering'))
-            elif 'Amyloidosis' in label:
-                colors.append(self._get_color('amyloidosis'))
-            else:
-                colors.append(self._get_color('default'))
+        colors = [self._get_color(_subtype_color_key(label)) for label in labels]
         
         fig = go.Figure(data=[go.Pie(
             labels=labels,
@@ -352,266 +613,209 @@ class AdvancedVisualizer:
             hovertemplate="<b>%{label}</b><br>Studies: %{value}<br>Percentage: %{percent}<extra></extra>"
         )])
         
-        # Add center annotation
-        fig.add_annotation(
-            text=f"Total<br>{total} Studies",
-            x=0.5, y=0.5,
-            font=dict(size=20, color=self._get_color('primary')),
-            showarrow=False
-        )
-        
         fig.update_layout(
             title="🎯 Multiple Myeloma Subtype Distribution",
-            template=self.theme,
             height=500,
-            annotations=[dict(text=f"Total Studies: {total}", x=0.5, y=0.5, showarrow=False)]
+            # Center annotation
+            annotations=[dict(
+                text=f"Total<br>{total} Studies",
+                x=0.5, y=0.5,
+                font=dict(size=20, color=self._get_color('primary')),
+                showarrow=False
+            )]
         )
         
         return fig
     
-    def _create_phase_distribution_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _create_phase_distribution_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create study phase distribution with detailed breakdown"""
         
-        # Extract study phases
-        study_types = [m.study_design.study_type.value for m in metadata_list if m.study_design.study_type]
+        # Count study phases; the chart imposes its own phase order
+        phase_counts = df['study_type'].value_counts(sort=False)
         
-        if not study_types:
+        if phase_counts.empty:
             return self._create_empty_figure("Phase Distribution", "No study phase data available")
         
-        phase_counts = Counter(study_types)
-        total_studies = sum(phase_counts.values())
+        total_studies = int(phase_counts.sum())
         
         # Sort phases logically
-        phase_order = ['Phase 1', 'Phase 1/2', 'Phase 2', 'Phase 3', 'Phase 4', 'Real World Study']
         sorted_phases = []
         sorted_counts = []
         sorted_colors = []
         
-        for phase in phase_order:
+        for phase in PHASE_ORDER:
             if phase in phase_counts:
                 sorted_phases.append(phase)
-                sorted_counts.append(phase_counts[phase])
-                sorted_colors.append(self._get_color(f'phase{phase.split()[-1].replace("/", "")}'.lower()))
+                sorted_counts.append(int(phase_counts[phase]))
+                sorted_colors.append(self._phase_colors[phase])
         
         # Add any remaining phases not in standard order
         for phase, count in phase_counts.items():
-            if phase not in phase_order:
+            if phase not in self._phase_colors:
                 sorted_phases.append(phase)
-                sorted_counts.append(count)
+                sorted_counts.append(int(count))
                 sorted_colors.append(self._get_color('default'))
         
         # Create bar chart with percentages
         percentages = [count/total_studies*100 for count in sorted_counts]
         
-        fig = go.Figure(data=[
-            go.Bar(
-                x=sorted_phases,
-                y=sorted_counts,
-                text=[f"{count}<br>({pct:.1f}%)" for count, pct in zip(sorted_counts, percentages)],
-                textposition='auto',
-                marker_color=sorted_colors,
-                hovertemplate="<b>%{x}</b><br>Studies: %{y}<br>Percentage: %{text}<extra></extra>"
-            )
-        ])
-        
-        fig.update_layout(
+        return self._figure(
+            [{
+                'type': 'bar',
+                'x': sorted_phases,
+                'y': sorted_counts,
+                'text': [f"{count}<br>({pct:.1f}%)" for count, pct in zip(sorted_counts, percentages)],
+                'textposition': 'auto',
+                'marker': {'color': sorted_colors},
+                'hovertemplate': "<b>%{x}</b><br>Studies: %{y}<br>Percentage: %{text}<extra></extra>"
+            }],
             title=f"📈 Clinical Trial Phase Distribution (n={total_studies})",
-            xaxis_title="Study Phase",
-            yaxis_title="Number of Studies",
-            template=self.theme,
-            height=500,
-            xaxis_tickangle=-45
+            xaxis={'title': {'text': "Study Phase"}, 'tickangle': -45},
+            yaxis={'title': {'text': "Number of Studies"}},
+            height=500
         )
-        
-        return fig
     
-    def _create_treatment_landscape_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _create_treatment_landscape_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create treatment regimen landscape analysis"""
         
         # Extract treatment regimens
-        all_regimens = []
-        for m in metadata_list:
-            for regimen in m.treatment_regimens:
-                if regimen.regimen_name and regimen.regimen_name != "Unknown":
-                    all_regimens.append(regimen.regimen_name)
+        all_regimens = df['regimens_all'].explode().dropna()
+        all_regimens = all_regimens[all_regimens != "Unknown"]
         
-        if not all_regimens:
+        if all_regimens.empty:
             return self._create_empty_figure("Treatment Landscape", "No treatment regimen data available")
         
-        regimen_counts = Counter(all_regimens)
-        
         # Get top 15 most common regimens
-        top_regimens = dict(regimen_counts.most_common(15))
+        top_regimens = all_regimens.value_counts(sort=False).nlargest(15)
         
-        regimens = list(top_regimens.keys())
-        counts = list(top_regimens.values())
+        regimens = top_regimens.index.tolist()
+        counts = top_regimens.tolist()
         
-        # Create horizontal bar chart for better readability
-        fig = go.Figure(data=[
-            go.Bar(
-                y=regimens,
-                x=counts,
-                orientation='h',
-                text=counts,
-                textposition='auto',
-                marker_color=self._get_color('primary'),
-                hovertemplate="<b>%{y}</b><br>Studies: %{x}<extra></extra>"
-            )
-        ])
+        # Shorten long names on the axis; hover shows the full name
+        labels = [r if len(r) <= 40 else r[:37] + '…' for r in regimens]
+        if len(set(labels)) < len(labels):
+            labels = regimens  # Truncation would merge distinct regimens
         
-        fig.update_layout(
-            title=f"💊 Treatment Regimen Landscape (Top 15)",
-            xaxis_title="Number of Studies",
-            yaxis_title="Treatment Regimens",
-            template=self.theme,
+        # Create horizontal bar chart for better readability
+        return self._figure(
+            [{
+                'type': 'bar',
+                'y': labels,
+                'x': counts,
+                'orientation': 'h',
+                'text': counts,
+                'textposition': 'auto',
+                'customdata': regimens,
+                'marker': {'color': self._get_color('primary')},
+                'hovertemplate': "<b>%{customdata}</b><br>Studies: %{x}<extra></extra>"
+            }],
+            title="💊 Treatment Regimen Landscape (Top 15)",
+            xaxis={'title': {'text': "Number of Studies"}},
+            yaxis={'title': {'text': "Treatment Regimens"}},
             height=max(500, len(regimens) * 25),
-            margin=dict(l=200)  # More space for long regimen names
+            margin={'l': min(300, max(map(len, labels)) * 7 + 20)}  # Fit the longest label
         )
-        
-        return fig
     
-    def _create_efficacy_analysis_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _create_efficacy_analysis_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create comprehensive efficacy analysis"""
         
-        # Extract efficacy data
-        efficacy_data = []
-        for m in metadata_list:
-            if m.efficacy_outcomes.overall_response_rate:
-                orr_data = m.efficacy_outcomes.overall_response_rate
-                orr_value = None
-                
-                if isinstance(orr_data, dict):
-                    orr_value = orr_data.get('value') or orr_data.get('rate')
-                elif isinstance(orr_data, (int, float)):
-                    orr_value = orr_data
-                
-                if orr_value and 0 <= orr_value <= 100:
-                    # Get MM subtype for this study
-                    mm_subtype = "Unknown"
-                    if m.disease_characteristics.mm_subtype:
-                        mm_subtype = m.disease_characteristics.mm_subtype[0].value
-                    
-                    # Get line of therapy
-                    line_of_therapy = m.treatment_history.line_of_therapy or "Unknown"
-                    
-                    # Get study size
-                    study_size = m.patient_demographics.total_enrolled or 0
-                    
-                    efficacy_data.append({
-                        'orr': orr_value,
-                        'mm_subtype': mm_subtype,
-                        'line_of_therapy': line_of_therapy,
-                        'study_size': study_size,
-                        'study_title': m.study_identification.title[:50] + "..." if len(m.study_identification.title) > 50 else m.study_identification.title
-                    })
-        
-        if not efficacy_data:
+        # Studies with a plausible ORR
+        efficacy = df[(df['orr'] > 0) & (df['orr'] <= 100)]
+        
+        if efficacy.empty:
             return self._create_empty_figure("Efficacy Analysis", "No efficacy data available")
         
-        df = pd.DataFrame(efficacy_data)
+        lines_of_therapy = efficacy['line_of_therapy'].fillna("Unknown").to_numpy()
+        study_sizes = efficacy['total_enrolled'].fillna(0).to_numpy()
         
         # Create bubble chart: ORR by MM subtype, sized by study size
-        fig = px.scatter(
-            df,
-            x='mm_subtype',
-            y='orr',
-            size='study_size',
-            color='line_of_therapy',
-            hover_data=['study_title'],
-            title="🎯 Efficacy Analysis: ORR by MM Subtype",
-            labels={
-                'orr': 'Overall Response Rate (%)',
-                'mm_subtype': 'MM Subtype',
-                'line_of_therapy': 'Line of Therapy',
-                'study_size': 'Study Size'
-            }
-        )
+        fig = go.Figure(data=self._bubble_traces(
+            x=efficacy['mm_subtype_primary'].to_numpy(),
+            y=efficacy['orr'].to_numpy(),
+            sizes=study_sizes,
+            groups=lines_of_therapy,
+            customdata=efficacy['title_short'].to_numpy(),
+            hovertemplate=(
+                "<b>%{customdata}</b><br>MM Subtype: %{x}<br>Overall Response Rate: %{y}%<br>"
+                "Line of Therapy: %{fullData.name}<br>Study Size: %{marker.size}<extra></extra>"
+            )
+        ))
         
         fig.update_layout(
-            template=self.theme,
+            title="🎯 Efficacy Analysis: ORR by MM Subtype",
+            xaxis_title="MM Subtype",
+            yaxis_title="Overall Response Rate (%)",
+            legend_title_text="Line of Therapy",
             height=600,
             xaxis_tickangle=-45
         )
         
-        # Add median lines for each subtype
-        for subtype in df['mm_subtype'].unique():
-            subtype_data = df[df['mm_subtype'] == subtype]
-            median_orr = subtype_data['orr'].median()
-            
-            fig.add_hline(
-                y=median_orr,
-                line_dash="dash",
-                line_color="gray",
-                annotation_text=f"Median: {median_orr:.1f}%",
-                annotation_position="top right"
-            )
+        # Mark each subtype's median ORR in one overlay trace
+        medians = efficacy.groupby('mm_subtype_primary', sort=False)['orr'].median()
+        fig.add_trace(go.Scatter(
+            x=medians.index.tolist(),
+            y=medians.tolist(),
+            mode='markers+text',
+            marker=dict(symbol='line-ew-open', size=40, line=dict(color='gray', width=2)),
+            text=[f"Median: {median_orr:.1f}%" for median_orr in medians],
+            textposition='top right',
+            name='Median ORR',
+            showlegend=False,
+            hoverinfo='skip'
+        ))
         
         return fig
     
-    def _create_safety_analysis_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _bubble_traces(self, x: np.ndarray, y: np.ndarray, sizes: np.ndarray, groups: np.ndarray,
+                       customdata: np.ndarray, hovertemplate: str) -> List[go.Scatter]:
+        """One bubble trace per group, sized by area like px.scatter (size_max=20)
+        
+        Builds the traces straight from arrays rather than going through a
+        DataFrame and Plotly Express.
+        """
+        max_size = sizes.max() if len(sizes) else 0
+        sizeref = 2.0 * max_size / (20.0 ** 2) if max_size > 0 else 1
+        scatter = go.Scattergl if len(x) > WEBGL_POINT_THRESHOLD else go.Scatter
+        
+        traces = []
+        for group in pd.unique(groups):
+            mask = groups == group
+            traces.append(scatter(
+                x=x[mask],
+                y=y[mask],
+                mode='markers',
+                name=str(group),
+                legendgroup=str(group),
+                marker=dict(size=sizes[mask], sizemode='area', sizeref=sizeref),
+                customdata=customdata[mask],
+                hovertemplate=hovertemplate
+            ))
+        return traces
+    
+    def _create_safety_analysis_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create safety profile analysis"""
         
-        # Extract safety data
-        safety_data = []
-        for m in metadata_list:
-            if m.safety_profile.grade_3_4_aes:
-                ae_data = m.safety_profile.grade_3_4_aes
-                
-                # Handle different data structures
-                total_ae_rate = 0
-                if isinstance(ae_data, list):
-                    # List of AE events with percentages
-                    for ae in ae_data:
-                        if isinstance(ae, dict) and 'percentage' in ae:
-                            total_ae_rate += ae['percentage']
-                elif isinstance(ae_data, dict):
-                    # Dictionary with overall rate
-                    total_ae_rate = ae_data.get('total_rate', 0)
-                elif isinstance(ae_data, (int, float)):
-                    total_ae_rate = ae_data
-                
-                if 0 <= total_ae_rate <= 100:
-                    # Get treatment info
-                    treatment_name = "Unknown"
-                    if m.treatment_regimens:
-                        treatment_name = m.treatment_regimens[0].regimen_name or "Unknown"
-                    
-                    # Get discontinuation rate
-                    disc_rate = 0
-                    if m.safety_profile.discontinuations:
-                        disc_data = m.safety_profile.discontinuations
-                        if isinstance(disc_data, dict):
-                            disc_rate = disc_data.get('total', 0) or disc_data.get('rate', 0)
-                        elif isinstance(disc_data, (int, float)):
-                            disc_rate = disc_data
-                    
-                    safety_data.append({
-                        'treatment': treatment_name,
-                        'grade_3_4_ae_rate': total_ae_rate,
-                        'discontinuation_rate': disc_rate,
-                        'study_title': m.study_identification.title[:30] + "..."
-                    })
-        
-        if not safety_data:
-            return self._create_empty_figure("Safety Analysis", "No safety data available")
+        safety = self._safety_rows(df)
         
-        df = pd.DataFrame(safety_data)
+        if safety.empty:
+            return self._create_empty_figure("Safety Analysis", "No safety data available")
         
         # Create safety scatter plot
         fig = go.Figure()
         
-        fig.add_trace(go.Scatter(
-            x=df['grade_3_4_ae_rate'],
-            y=df['discontinuation_rate'],
+        scatter = go.Scattergl if len(safety) > WEBGL_POINT_THRESHOLD else go.Scatter
+        fig.add_trace(scatter(
+            x=safety['ae_rate'],
+            y=safety['disc_rate'],
             mode='markers',
             marker=dict(
                 size=10,
-                color=df['grade_3_4_ae_rate'],
+                color=safety['ae_rate'],
                 colorscale='Reds',
                 showscale=True,
                 colorbar=dict(title="Grade 3-4 AE Rate (%)")
             ),
-            text=df['treatment'],
+            text=safety['regimen_primary'],
             hovertemplate="<b>%{text}</b><br>Grade 3-4 AEs: %{x}%<br>Discontinuations: %{y}%<extra></extra>"
         ))
         
@@ -623,82 +827,57 @@ class AdvancedVisualizer:
             title="⚠️ Safety Profile Analysis",
             xaxis_title="Grade 3-4 Adverse Event Rate (%)",
             yaxis_title="Treatment Discontinuation Rate (%)",
-            template=self.theme,
             height=500
         )
         
         return fig
     
-    def _create_patient_demographics_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    @staticmethod
+    def _safety_rows(df: pd.DataFrame) -> pd.DataFrame:
+        """Studies with a plausible grade 3-4 AE rate"""
+        return df[(df['ae_rate'] >= 0) & (df['ae_rate'] <= 100)]
+    
+    def _create_patient_demographics_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create patient demographics analysis"""
         
         # Extract demographic data
-        ages = []
-        male_percentages = []
-        enrollments = []
+        ages = df['median_age'].dropna().to_numpy()
+        male_percentages = df['male_pct'].dropna().to_numpy()
+        enrollments = df['total_enrolled'].dropna().to_numpy()
         
-        for m in metadata_list:
-            if m.patient_demographics.median_age:
-                ages.append(m.patient_demographics.median_age)
-            
-            if m.patient_demographics.male_percentage:
-                male_percentages.append(m.patient_demographics.male_percentage)
-            
-            if m.patient_demographics.total_enrolled:
-                enrollments.append(m.patient_demographics.total_enrolled)
-        
-        if not any([ages, male_percentages, enrollments]):
+        if not (ages.size or male_percentages.size or enrollments.size):
             return self._create_empty_figure("Patient Demographics", "No demographic data available")
         
         # Create subplots
         fig = make_subplots(
             rows=1, cols=3,
             subplot_titles=('Age Distribution', 'Gender Distribution', 'Enrollment Size'),
-            specs=[[{"type": "histogram"}, {"type": "histogram"}, {"type": "histogram"}]]
+            specs=[[{"type": "bar"}, {"type": "bar"}, {"type": "bar"}]]
         )
         
         # Age distribution
-        if ages:
+        if ages.size:
             fig.add_trace(
-                go.Histogram(
-                    x=ages,
-                    nbinsx=10,
-                    name="Median Age",
-                    marker_color=self._get_color('primary'),
-                    hovertemplate="Age Range: %{x}<br>Studies: %{y}<extra></extra>"
-                ),
+                self._histogram_bar(ages, "Median Age", self._get_color('primary'), "Age Range"),
                 row=1, col=1
             )
         
         # Gender distribution
-        if male_percentages:
+        if male_percentages.size:
             fig.add_trace(
-                go.Histogram(
-                    x=male_percentages,
-                    nbinsx=10,
-                    name="Male %",
-                    marker_color=self._get_color('secondary'),
-                    hovertemplate="Male %: %{x}<br>Studies: %{y}<extra></extra>"
-                ),
+                self._histogram_bar(male_percentages, "Male %", self._get_color('secondary'), "Male %"),
                 row=1, col=2
             )
         
         # Enrollment distribution
-        if enrollments:
+        if enrollments.size:
             fig.add_trace(
-                go.Histogram(
-                    x=enrollments,
-                    nbinsx=15,
-                    name="Enrollment",
-                    marker_color=self._get_color('success'),
-                    hovertemplate="Enrollment: %{x}<br>Studies: %{y}<extra></extra>"
-                ),
+                self._histogram_bar(enrollments, "Enrollment", self._get_color('success'), "Enrollment"),
                 row=1, col=3
             )
         
         fig.update_layout(
             title="👥 Patient Demographics Analysis",
-            template=self.theme,
             height=400,
             showlegend=False
         )
@@ -711,80 +890,86 @@ class AdvancedVisualizer:
         
         return fig
     
-    def _create_efficacy_safety_bubble_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
-        """Create efficacy vs safety bubble chart"""
+    def _histogram_bar(self, values: np.ndarray, name: str, color: str, label: str) -> go.Bar:
+        """Histogram binned in NumPy and drawn as bars
+        
+        Only the bin counts and edges reach the browser, not every value.
+        """
+        counts, edges = np.histogram(values, bins=_fd_bin_count(values))
+        return go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            customdata=np.column_stack([edges[:-1], edges[1:]]),
+            name=name,
+            marker_color=color,
+            hovertemplate=f"{label}: %{{customdata[0]:.3g}}-%{{customdata[1]:.3g}}<br>Studies: %{{y}}<extra></extra>"
+        )
+    
+    def _create_efficacy_safety_bubble_chart(self, df: pd.DataFrame,
+                                             max_points: int = DENSITY_POINT_THRESHOLD) -> go.Figure:
+        """Create efficacy vs safety bubble chart
         
-        # Extract efficacy and safety data
-        bubble_data = []
-        for m in metadata_list:
-            orr = None
-            ae_rate = None
-            study_size = m.patient_demographics.total_enrolled or 10
-            
-            # Extract ORR
-            if m.efficacy_outcomes.overall_response_rate:
-                orr_data = m.efficacy_outcomes.overall_response_rate
-                if isinstance(orr_data, dict):
-                    orr = orr_data.get('value') or orr_data.get('rate')
-                elif isinstance(orr_data, (int, float)):
-                    orr = orr_data
-            
-            # Extract AE rate
-            if m.safety_profile.grade_3_4_aes:
-                ae_data = m.safety_profile.grade_3_4_aes
-                if isinstance(ae_data, list) and ae_data:
-                    # Sum percentages from list
-                    ae_rate = sum([ae.get('percentage', 0) for ae in ae_data if isinstance(ae, dict)])
-                elif isinstance(ae_data, dict):
-                    ae_rate = ae_data.get('total_rate', 0)
-                elif isinstance(ae_data, (int, float)):
-                    ae_rate = ae_data
-            
-            # Get treatment name
-            treatment_name = "Unknown"
-            if m.treatment_regimens and m.treatment_regimens[0].regimen_name:
-                treatment_name = m.treatment_regimens[0].regimen_name
-            
-            # Get MM subtype
-            mm_subtype = "Unknown"
-            if m.disease_characteristics.mm_subtype:
-                mm_subtype = m.disease_characteristics.mm_subtype[0].value
-            
-            if orr and ae_rate and 0 <= orr <= 100 and 0 <= ae_rate <= 100:
-                bubble_data.append({
-                    'orr': orr,
-                    'ae_rate': ae_rate,
-                    'study_size': study_size,
-                    'treatment': treatment_name,
-                    'mm_subtype': mm_subtype,
-                    'study_title': m.study_identification.title[:40] + "..."
-                })
+        Above max_points studies the bubbles are replaced by a 2-D density
+        heatmap, so the payload scales with the bin grid rather than the
+        number of studies.
+        """
         
-        if not bubble_data:
+        # Studies with both a plausible ORR and AE rate
+        both = df[
+            df['orr'].between(0, 100, inclusive='right') & df['ae_rate'].between(0, 100, inclusive='right')
+        ]
+        
+        if both.empty:
             return self._create_empty_figure("Efficacy-Safety Analysis", "Insufficient efficacy and safety data")
         
-        df = pd.DataFrame(bubble_data)
+        if len(both) > max_points:
+            # Density heatmap; edges are passed so Plotly places the cells
+            density, ae_edges, orr_edges = np.histogram2d(
+                both['ae_rate'].to_numpy(), both['orr'].to_numpy(),
+                bins=DENSITY_BINS, range=[[0, 100], [0, 100]]
+            )
+            fig = go.Figure(data=go.Heatmap(
+                z=density.T,
+                x=ae_edges,
+                y=orr_edges,
+                colorscale='Blues',
+                colorbar=dict(title="Studies"),
+                hovertemplate=(
+                    "Grade 3-4 Adverse Event Rate: %{x:.1f}%<br>Overall Response Rate: %{y:.1f}%<br>"
+                    "Studies: %{z}<extra></extra>"
+                )
+            ))
+        else:
+            study_sizes = both['total_enrolled'].fillna(10).to_numpy()
+            
+            # Create bubble chart
+            fig = go.Figure(data=self._bubble_traces(
+                x=both['ae_rate'].to_numpy(),
+                y=both['orr'].to_numpy(),
+                sizes=study_sizes,
+                groups=both['mm_subtype_primary'].to_numpy(),
+                customdata=np.column_stack([
+                    both['title_short'].to_numpy(),
+                    both['regimen_primary'].to_numpy()
+                ]),
+                hovertemplate=(
+                    "<b>%{customdata[0]}</b><br>Treatment: %{customdata[1]}<br>"
+                    "Grade 3-4 Adverse Event Rate: %{x}%<br>Overall Response Rate: %{y}%<br>"
+                    "Study Size: %{marker.size}<extra></extra>"
+                )
+            ))
         
-        # Create bubble chart
-        fig = px.scatter(
-            df,
-            x='ae_rate',
-            y='orr',
-            size='study_size',
-            color='mm_subtype',
-            hover_data=['treatment', 'study_title'],
+        fig.update_layout(
             title="⚖️ Efficacy vs Safety Analysis",
-            labels={
-                'ae_rate': 'Grade 3-4 Adverse Event Rate (%)',
-                'orr': 'Overall Response Rate (%)',
-                'study_size': 'Study Size',
-                'mm_subtype': 'MM Subtype'
-            }
+            xaxis_title="Grade 3-4 Adverse Event Rate (%)",
+            yaxis_title="Overall Response Rate (%)",
+            legend_title_text="MM Subtype"
         )
         
         # Add quadrant lines
-        median_orr = df['orr'].median()
-        median_ae = df['ae_rate'].median()
+        median_orr = both['orr'].median()
+        median_ae = both['ae_rate'].median()
         
         fig.add_hline(y=median_orr, line_dash="dash", line_color="gray", 
                      annotation_text=f"Median ORR: {median_orr:.1f}%")
@@ -802,36 +987,17 @@ class AdvancedVisualizer:
                           bgcolor="red", bordercolor="darkred")
         
         fig.update_layout(
-            template=self.theme,
             height=600
         )
         
         return fig
     
-    def _create_novel_agents_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _create_novel_agents_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create novel agents adoption analysis"""
         
-        # Define novel agent keywords
-        novel_keywords = {
-            'CAR-T': ['car-t', 'cart', 'ciltacabtagene', 'idecabtagene', 'cilta-cel', 'ide-cel'],
-            'Bispecific': ['bispecific', 'teclistamab', 'talquetamab', 'elranatamab'],
-            'ADC': ['belantamab', 'mafodotin', 'adc', 'antibody-drug'],
-            'BCL-2': ['venetoclax', 'bcl-2', 'bcl2'],
-            'SINE': ['selinexor', 'sine', 'exportin'],
-            'HDAC': ['panobinostat', 'hdac', 'histone deacetylase']
-        }
-        
         # Count novel agents
-        novel_counts = {agent_type: 0 for agent_type in novel_keywords.keys()}
-        total_studies = len(metadata_list)
-        
-        for m in metadata_list:
-            study_text = (m.study_identification.title + " " + 
-                         " ".join([r.regimen_name or "" for r in m.treatment_regimens])).lower()
-            
-            for agent_type, keywords in novel_keywords.items():
-                if any(keyword in study_text for keyword in keywords):
-                    novel_counts[agent_type] += 1
+        novel_counts = self._novel_agent_counts(df)
+        total_studies = len(df)
         
         # Calculate percentages
         agent_types = list(novel_counts.keys())
@@ -839,208 +1005,332 @@ class AdvancedVisualizer:
         percentages = [count/total_studies*100 if total_studies > 0 else 0 for count in counts]
         
         # Create horizontal bar chart
-        fig = go.Figure(data=[
-            go.Bar(
-                y=agent_types,
-                x=percentages,
-                orientation='h',
-                text=[f"{count} ({pct:.1f}%)" for count, pct in zip(counts, percentages)],
-                textposition='auto',
-                marker_color=[
-                    self._get_color('car_t'), self._get_color('bispecific'), 
-                    self._get_color('adc'), self._get_color('primary'),
-                    self._get_color('secondary'), self._get_color('warning')
-                ],
-                hovertemplate="<b>%{y}</b><br>Studies: %{text}<br>% of Total: %{x:.1f}%<extra></extra>"
-            )
-        ])
-        
-        fig.update_layout(
+        return self._figure(
+            [{
+                'type': 'bar',
+                'y': agent_types,
+                'x': percentages,
+                'orientation': 'h',
+                'text': [f"{count} ({pct:.1f}%)" for count, pct in zip(counts, percentages)],
+                'textposition': 'auto',
+                'marker': {'color': self._novel_agent_colors},
+                'hovertemplate': "<b>%{y}</b><br>Studies: %{text}<br>% of Total: %{x:.1f}%<extra></extra>"
+            }],
             title=f"🧬 Novel Agent Adoption (n={total_studies} studies)",
-            xaxis_title="Percentage of Studies (%)",
-            yaxis_title="Novel Agent Type",
-            template=self.theme,
+            xaxis={'title': {'text': "Percentage of Studies (%)"}},
+            yaxis={'title': {'text': "Novel Agent Type"}},
             height=400
         )
+    
+    @staticmethod
+    def _novel_agent_counts(df: pd.DataFrame) -> Dict[str, int]:
+        """Number of studies mentioning each novel agent class"""
+        counts = [0] * len(NOVEL_AGENT_KEYWORDS)
         
-        return fig
+        for study_text in df['study_text']:
+            mask = _novel_agent_mask(study_text)
+            for index in range(len(counts)):
+                counts[index] += (mask >> index) & 1
+        
+        return dict(zip(NOVEL_AGENT_KEYWORDS, counts))
     
-    def _create_response_rates_by_line_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    def _create_response_rates_by_line_chart(self, df: pd.DataFrame) -> go.Figure:
         """Create response rates by line of therapy"""
         
-        # Extract response rates by line of therapy
-        line_data = defaultdict(list)
+        rated = df[(df['orr'] > 0) & (df['orr'] <= 100)].dropna(subset=['line_of_therapy'])
         
-        for m in metadata_list:
-            line_of_therapy = m.treatment_history.line_of_therapy
-            if not line_of_therapy:
-                continue
-                
-            # Clean up line of therapy naming
-            if 'first' in line_of_therapy.lower() or '1' in line_of_therapy:
-                line_key = "First Line"
-            elif 'second' in line_of_therapy.lower() or '2' in line_of_therapy:
-                line_key = "Second Line"
-            elif 'third' in line_of_therapy.lower() or '3' in line_of_therapy:
-                line_key = "Third Line"
-            elif 'fourth' in line_of_therapy.lower() or '4' in line_of_therapy:
-                line_key = "Fourth+ Line"
-            else:
-                line_key = "Other"
-            
-            # Extract ORR
-            if m.efficacy_outcomes.overall_response_rate:
-                orr_data = m.efficacy_outcomes.overall_response_rate
-                orr = None
-                if isinstance(orr_data, dict):
-                    orr = orr_data.get('value') or orr_data.get('rate')
-                elif isinstance(orr_data, (int, float)):
-                    orr = orr_data
-                
-                if orr and 0 <= orr <= 100:
-                    line_data[line_key].append(orr)
-        
-        if not line_data:
+        if rated.empty:
             return self._create_empty_figure("Response Rates by Line", "No line of therapy data available")
         
+        # Group response rates by line of therapy: sort by line code, then split
+        # at the group boundaries; np.unique orders the lines alphabetically
+        lines, line_idx = np.unique(
+            rated['line_of_therapy'].map(_line_of_therapy_key).to_numpy(), return_inverse=True
+        )
+        order = np.argsort(line_idx, kind='stable')
+        boundaries = np.cumsum(np.bincount(line_idx))[:-1]
+        line_orrs = np.split(rated['orr'].to_numpy()[order], boundaries)
+        
         # Create box plot
         fig = go.Figure()
         
-        colors = [self._get_color('success'), self._get_color('primary'), 
-                 self._get_color('warning'), self._get_color('danger')]
+        colors = self._line_colors
         
-        for i, (line, orr_values) in enumerate(sorted(line_data.items())):
-            if orr_values:
+        for i, (line, orr_values) in enumerate(zip(lines, line_orrs)):
+            color = colors[i % len(colors)]
+            
+            if len(orr_values) <= WEBGL_POINT_THRESHOLD:
                 fig.add_trace(go.Box(
                     y=orr_values,
                     name=line,
-                    marker_color=colors[i % len(colors)],
+                    marker_color=color,
                     boxpoints='all',
                     jitter=0.3,
                     pointpos=-1.5,
                     hovertemplate="<b>%{fullData.name}</b><br>ORR: %{y}%<extra></extra>"
                 ))
+                continue
+            
+            # Large groups: box statistics computed here, and only the
+            # outliers sent as points (one WebGL trace)
+            stats, outliers = self._box_stats(orr_values)
+            fig.add_trace(go.Box(
+                x=[line],
+                name=line,
+                marker_color=color,
+                **stats
+            ))
+            if outliers.size:
+                fig.add_trace(go.Scattergl(
+                    x=[line] * outliers.size,
+                    y=outliers,
+                    name=line,
+                    mode='markers',
+                    marker=dict(size=4, opacity=0.5, color=color),
+                    hovertemplate="<b>%{x}</b><br>ORR: %{y}%<extra></extra>"
+                ))
         
         fig.update_layout(
             title="📊 Overall Response Rates by Line of Therapy",
             yaxis_title="Overall Response Rate (%)",
             xaxis_title="Line of Therapy",
-            template=self.theme,
             height=500,
             showlegend=False
         )
         
         return fig
     
-    def _create_study_size_distribution(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+    @staticmethod
+    def _box_stats(values: np.ndarray) -> Tuple[Dict[str, List[float]], np.ndarray]:
+        """Precomputed go.Box statistics and the points outside the whiskers
+        
+        Quartiles use linear interpolation like Plotly's default; whiskers
+        end at the furthest points within 1.5 IQR of the box.
+        """
+        q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+        stats = {
+            'q1': [q1],
+            'median': [median],
+            'q3': [q3],
+            'lowerfence': [values[inside].min()],
+            'upperfence': [values[inside].max()],
+        }
+        return stats, values[~inside]
+    
+    def _create_study_size_distribution(self, df: pd.DataFrame) -> go.Figure:
         """Create study size distribution analysis"""
         
         # Extract enrollment data
-        enrollments = []
-        for m in metadata_list:
-            if m.patient_demographics.total_enrolled:
-                enrollments.append(m.patient_demographics.total_enrolled)
+        enrollments = df['total_enrolled'].dropna()
         
-        if not enrollments:
+        if enrollments.empty:
             return self._create_empty_figure("Study Size Distribution", "No enrollment data available")
         
         # Create histogram with size categories
-        size_categories = []
-        for enrollment in enrollments:
-            if enrollment < 30:
-                size_categories.append("Small (<30)")
-            elif enrollment < 100:
-                size_categories.append("Medium (30-99)")
-            elif enrollment < 300:
-                size_categories.append("Large (100-299)")
-            else:
-                size_categories.append("Very Large (≥300)")
-        
-        category_counts = Counter(size_categories)
+        ordered_counts = self._study_size_counts(enrollments)
+        
+        return self._figure(
+            [{
+                'type': 'bar',
+                'x': list(STUDY_SIZE_CATEGORIES),
+                'y': ordered_counts,
+                'text': ordered_counts,
+                'textposition': 'auto',
+                'marker': {'color': self._study_size_colors},
+                'hovertemplate': "<b>%{x}</b><br>Studies: %{y}<extra></extra>"
+            }],
+            title=f"📏 Study Size Distribution (n={len(enrollments)} studies)",
+            xaxis={'title': {'text': "Study Size Category"}},
+            yaxis={'title': {'text': "Number of Studies"}},
+            height=500,
+            # Add statistics
+            annotations=[{
+                'text': self._study_size_summary(enrollments),
+                'xref': "paper", 'yref': "paper",
+                'x': 0.95, 'y': 0.95,
+                'bgcolor': "white",
+                'bordercolor': "gray",
+                'borderwidth': 1
+            }]
+        )
+    
+    @staticmethod
+    def _study_size_counts(enrollments: pd.Series) -> List[int]:
+        """Number of studies in each of STUDY_SIZE_CATEGORIES"""
+        bins = np.digitize(enrollments.to_numpy(), STUDY_SIZE_BIN_EDGES)
+        return np.bincount(bins, minlength=len(STUDY_SIZE_CATEGORIES)).tolist()
+    
+    @staticmethod
+    def _study_size_summary(enrollments: pd.Series) -> str:
+        """Total, median and mean enrollment as annotation text"""
+        total_patients = int(enrollments.sum())
+        median_size = enrollments.median()
+        mean_size = enrollments.mean()
+        return f"Total Patients: {total_patients:,}<br>Median Size: {median_size:.0f}<br>Mean Size: {mean_size:.0f}"
+    
+    def create_overview_figure(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
+        """Key dashboard charts as panels of one figure
         
-        # Define order
-        ordered_categories = ["Small (<30)", "Medium (30-99)", "Large (100-299)", "Very Large (≥300)"]
-        ordered_counts = [category_counts.get(cat, 0) for cat in ordered_categories]
+        The browser initializes and renders a single plot instead of one per
+        chart. Panels carry the charts' traces only; reference lines, colour
+        bars and legends stay on the individual charts.
+        """
+        if not metadata_list:
+            return self._create_empty_figure("Dashboard Overview", "No metadata provided for visualization")
         
-        fig = go.Figure(data=[
-            go.Bar(
-                x=ordered_categories,
-                y=ordered_counts,
-                text=ordered_counts,
-                textposition='auto',
-                marker_color=[
-                    self._get_color('danger'), self._get_color('warning'),
-                    self._get_color('primary'), self._get_color('success')
-                ],
-                hovertemplate="<b>%{x}</b><br>Studies: %{y}<extra></extra>"
-            )
-        ])
+        dashboard = self.create_lazy_dashboard(metadata_list)
+        rows = math.ceil(len(OVERVIEW_PANELS) / 2)
+        specs = [[None, None] for _ in range(rows)]
+        for i, (_, _, panel_type) in enumerate(OVERVIEW_PANELS):
+            specs[i // 2][i % 2] = {'type': panel_type}
         
-        # Add statistics
-        total_patients = sum(enrollments)
-        median_size = np.median(enrollments)
-        mean_size = np.mean(enrollments)
-        
-        fig.add_annotation(
-            text=f"Total Patients: {total_patients:,}<br>Median Size: {median_size:.0f}<br>Mean Size: {mean_size:.0f}",
-            xref="paper", yref="paper",
-            x=0.95, y=0.95,
-            bgcolor="white",
-            bordercolor="gray",
-            borderwidth=1
+        fig = make_subplots(
+            rows=rows, cols=2,
+            specs=specs,
+            subplot_titles=[title for _, title, _ in OVERVIEW_PANELS],
+            horizontal_spacing=0.08,
+            vertical_spacing=0.12
         )
         
+        for i, (key, _, _) in enumerate(OVERVIEW_PANELS):
+            for trace in dashboard[key].data:
+                fig.add_trace(trace, row=i // 2 + 1, col=i % 2 + 1)
+        
+        fig.update_traces(showlegend=False)
+        fig.update_traces(marker_showscale=False, selector=dict(type='scatter'))
+        fig.update_traces(marker_showscale=False, selector=dict(type='scattergl'))
         fig.update_layout(
-            title=f"📏 Study Size Distribution (n={len(enrollments)} studies)",
-            xaxis_title="Study Size Category",
-            yaxis_title="Number of Studies",
-            template=self.theme,
-            height=500
+            title=f"📊 Dashboard Overview ({len(metadata_list)} Studies)",
+            height=400 * rows
         )
         
         return fig
     
+    # In-place updates of existing dashboard figures
+    
+    def update_dashboard(self, figures: Dict[str, go.Figure],
+                         metadata_list: List[ComprehensiveAbstractMetadata]) -> Dict[str, go.Figure]:
+        """Refresh a dashboard for new metadata, e.g. after a filter change
+        
+        Charts with a fixed trace layout (safety scatter, novel agents, study
+        size) have their trace data patched in place, keeping their layout
+        objects. Every other chart, and any figure that is currently an empty
+        or error placeholder, is rebuilt from the same flattened frame; keys
+        without a builder are kept as they are.
+        """
+        if not metadata_list or not figures:
+            return self.create_comprehensive_dashboard(metadata_list)
+        
+        df = self._flatten_metadata(metadata_list)
+        patchers = {
+            'safety_analysis': self._patch_safety_analysis_chart,
+            'novel_agents_adoption': self._patch_novel_agents_chart,
+            'study_size_distribution': self._patch_study_size_distribution,
+        }
+        
+        rebuilt = LazyDashboard(self, df, self._dashboard_builders())
+        updated = {}
+        for key, fig in figures.items():
+            patch = patchers.get(key)
+            try:
+                if patch is not None and patch(fig, df):
+                    updated[key] = fig
+                    continue
+            except Exception as e:
+                self.logger.warning(f"Could not patch {key}, rebuilding: {e}")
+            updated[key] = rebuilt[key] if key in rebuilt else fig
+        
+        return updated
+    
+    def _patch_safety_analysis_chart(self, fig: go.Figure, df: pd.DataFrame) -> bool:
+        """Swap the safety scatter's points; False if the chart must be rebuilt"""
+        safety = self._safety_rows(df)
+        trace_type = 'scattergl' if len(safety) > WEBGL_POINT_THRESHOLD else 'scatter'
+        if safety.empty or len(fig.data) != 1 or fig.data[0].type != trace_type:
+            return False
+        
+        fig.update_traces(
+            x=safety['ae_rate'],
+            y=safety['disc_rate'],
+            marker_color=safety['ae_rate'],
+            text=safety['regimen_primary']
+        )
+        return True
+    
+    def _patch_novel_agents_chart(self, fig: go.Figure, df: pd.DataFrame) -> bool:
+        """Swap the novel agent bars' values; False if the chart must be rebuilt"""
+        if df.empty or len(fig.data) != 1 or fig.data[0].type != 'bar':
+            return False
+        
+        total_studies = len(df)
+        counts = list(self._novel_agent_counts(df).values())
+        percentages = [count/total_studies*100 for count in counts]
+        fig.update_traces(
+            x=percentages,
+            text=[f"{count} ({pct:.1f}%)" for count, pct in zip(counts, percentages)]
+        )
+        fig.layout.title.text = f"🧬 Novel Agent Adoption (n={total_studies} studies)"
+        return True
+    
+    def _patch_study_size_distribution(self, fig: go.Figure, df: pd.DataFrame) -> bool:
+        """Swap the study size bar heights; False if the chart must be rebuilt"""
+        enrollments = df['total_enrolled'].dropna()
+        if enrollments.empty or len(fig.data) != 1 or fig.data[0].type != 'bar' or not fig.layout.annotations:
+            return False
+        
+        ordered_counts = self._study_size_counts(enrollments)
+        fig.update_traces(y=ordered_counts, text=ordered_counts)
+        fig.layout.annotations[0].text = self._study_size_summary(enrollments)
+        fig.layout.title.text = f"📏 Study Size Distribution (n={len(enrollments)} studies)"
+        return True
+    
     # Additional utility methods for advanced analytics
     
     def create_treatment_timeline_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
         """Create treatment evolution timeline if publication years available"""
         
         # Extract publication years and treatments
-        timeline_data = []
+        pub_years = []
+        treatments = []
         for m in metadata_list:
             pub_year = m.study_identification.publication_year
-            if pub_year and m.treatment_regimens:
+            if pub_year:
                 for regimen in m.treatment_regimens:
-                    if regimen.regimen_name and regimen.regimen_name != "Unknown":
-                        timeline_data.append({
-                            'year': pub_year,
-                            'treatment': regimen.regimen_name,
-                            'title': m.study_identification.title
-                        })
-        
-        if not timeline_data:
-            return self._create_empty_figure("Treatment Timeline", "No publication year data available")
+                    regimen_name = regimen.regimen_name
+                    if regimen_name and regimen_name != "Unknown":
+                        pub_years.append(pub_year)
+                        treatments.append(regimen_name)
         
-        df = pd.DataFrame(timeline_data)
-        
-        # Count treatments by year
-        yearly_counts = df.groupby(['year', 'treatment']).size().reset_index(name='count')
+        if not pub_years:
+            return self._create_empty_figure("Treatment Timeline", "No publication year data available")
         
-        fig = px.line(
-            yearly_counts,
-            x='year',
-            y='count',
-            color='treatment',
+        # Count treatments by year on integer codes: one row per year, one
+        # column per treatment, both sorted
+        year_codes, years = pd.factorize(np.asarray(pub_years, dtype=np.int16), sort=True)
+        treatment_codes, treatment_names = pd.factorize(pd.Categorical(treatments), sort=True)
+        yearly_counts = np.bincount(
+            year_codes * len(treatment_names) + treatment_codes,
+            minlength=len(years) * len(treatment_names)
+        ).reshape(len(years), len(treatment_names))
+        
+        trace_type = 'scattergl' if yearly_counts.size > WEBGL_POINT_THRESHOLD else 'scatter'
+        return self._figure(
+            [{
+                'type': trace_type,
+                'x': years,
+                'y': yearly_counts[:, i],
+                'mode': 'lines',
+                'name': treatment,
+                'hovertemplate': "<b>%{fullData.name}</b><br>Publication Year: %{x}<br>Number of Studies: %{y}<extra></extra>"
+            } for i, treatment in enumerate(treatment_names)],
             title="📅 Treatment Evolution Timeline",
-            labels={'year': 'Publication Year', 'count': 'Number of Studies'}
-        )
-        
-        fig.update_layout(
-            template=self.theme,
+            xaxis={'title': {'text': "Publication Year"}},
+            yaxis={'title': {'text': "Number of Studies"}},
+            legend={'title': {'text': "treatment"}},
             height=500
         )
-        
-        return fig
     
     def create_competitive_landscape_chart(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> go.Figure:
         """Create competitive landscape analysis"""
@@ -1055,13 +1345,12 @@ class AdvancedVisualizer:
         if not sponsors:
             return self._create_empty_figure("Competitive Landscape", "No sponsor data available")
         
-        sponsor_counts = Counter(sponsors)
-        top_sponsors = dict(sponsor_counts.most_common(10))
+        top_sponsors = pd.Series(sponsors).value_counts(sort=False).nlargest(10)
         
         fig = go.Figure(data=[
             go.Pie(
-                labels=list(top_sponsors.keys()),
-                values=list(top_sponsors.values()),
+                labels=top_sponsors.index.tolist(),
+                values=top_sponsors.tolist(),
                 hole=.3,
                 textinfo='label+percent',
                 hovertemplate="<b>%{label}</b><br>Studies: %{value}<br>Percentage: %{percent}<extra></extra>"
@@ -1070,7 +1359,6 @@ class AdvancedVisualizer:
         
         fig.update_layout(
             title="🏢 Competitive Landscape - Top Study Sponsors",
-            template=self.theme,
             height=500
         )
         
@@ -1079,46 +1367,55 @@ class AdvancedVisualizer:
     def export_dashboard_data(self, metadata_list: List[ComprehensiveAbstractMetadata]) -> Dict[str, pd.DataFrame]:
         """Export all visualization data as DataFrames for further analysis"""
         
-        export_data = {}
-        
-        # Study overview data
         study_overview = []
+        treatment_data = []
+        efficacy_data = defaultdict(list)
+        
+        # One pass fills the overview, treatment and efficacy tables
         for m in metadata_list:
+            title = m.study_identification.title
+            study_type = m.study_design.study_type
+            mm_subtypes = m.disease_characteristics.mm_subtype
+            
+            # Study overview data
             study_overview.append({
-                'title': m.study_identification.title,
-                'study_type': m.study_design.study_type.value if m.study_design.study_type else None,
-                'mm_subtype': ', '.join([s.value for s in m.disease_characteristics.mm_subtype]) if m.disease_characteristics.mm_subtype else None,
+                'title': title,
+                'study_type': study_type.value if study_type else None,
+                'mm_subtype': ', '.join([s.value for s in mm_subtypes]) if mm_subtypes else None,
                 'total_enrolled': m.patient_demographics.total_enrolled,
                 'confidence_score': m.extraction_confidence
             })
-        export_data['study_overview'] = pd.DataFrame(study_overview)
-        
-        # Treatment data
-        treatment_data = []
-        for m in metadata_list:
+            
+            # Treatment data
             for regimen in m.treatment_regimens:
                 treatment_data.append({
-                    'study_title': m.study_identification.title,
+                    'study_title': title,
                     'regimen_name': regimen.regimen_name,
                     'drugs': ', '.join([drug.get('name', '') for drug in regimen.drugs]) if regimen.drugs else None,
                     'cycle_length': regimen.cycle_length
                 })
-        export_data['treatments'] = pd.DataFrame(treatment_data)
-        
-        # Efficacy data
-        efficacy_data = []
-        for m in metadata_list:
-            efficacy_data.append({
-                'study_title': m.study_identification.title,
-                'orr': self._extract_numeric_value(m.efficacy_outcomes.overall_response_rate),
-                'cr_rate': self._extract_numeric_value(m.efficacy_outcomes.complete_response_rate),
-                'pfs_median': self._extract_numeric_value(m.efficacy_outcomes.progression_free_survival)
-            })
-        export_data['efficacy'] = pd.DataFrame(efficacy_data)
+            
+            # Efficacy data, raw until the columns are reduced below
+            outcomes = m.efficacy_outcomes
+            efficacy_data['study_title'].append(title)
+            efficacy_data['orr'].append(outcomes.overall_response_rate)
+            efficacy_data['cr_rate'].append(outcomes.complete_response_rate)
+            efficacy_data['pfs_median'].append(outcomes.progression_free_survival)
+        
+        efficacy_df = pd.DataFrame(efficacy_data, columns=['study_title', 'orr', 'cr_rate', 'pfs_median'])
+        for column in ('orr', 'cr_rate', 'pfs_median'):
+            efficacy_df[column] = efficacy_df[column].map(self._extract_numeric_value)
+        
+        export_data = {
+            'study_overview': pd.DataFrame(study_overview),
+            'treatments': pd.DataFrame(treatment_data),
+            'efficacy': efficacy_df
+        }
         
         return export_data
     
-    def _extract_numeric_value(self, data: Any) -> Optional[float]:
+    @staticmethod
+    def _extract_numeric_value(data: Any) -> Optional[float]:
         """Helper to extract numeric values from various data structures"""
         if isinstance(data, dict):
             return data.get('value') or data.get('rate') or data.get('median')
@@ -1126,6 +1423,18 @@ class AdvancedVisualizer:
             return data
         return None
 
+    def _line_of_therapy_bars(self, df: pd.DataFrame, series: Tuple[Tuple[str, str, str], ...]) -> List[go.Bar]:
+        """Bars per line of therapy for each (column, name, color key) present in the analyzer table"""
+        columns = set(df.columns)
+        if 'line_of_therapy' not in columns:
+            return []
+        x = df['line_of_therapy'].to_numpy()
+        return [
+            go.Bar(x=x, y=df[column].to_numpy(), name=name, marker_color=self._get_color(color_key))
+            for column, name, color_key in series
+            if column in columns
+        ]
+    
     def _create_efficacy_analysis_chart_from_analyzer(self, efficacy_benchmarks: Dict[str, Any]) -> go.Figure:
         """Create efficacy analysis plot using analyzer results (benchmarks by line of therapy)"""
         if not efficacy_benchmarks or 'overall_benchmarks' not in efficacy_benchmarks:
@@ -1133,25 +1442,13 @@ class AdvancedVisualizer:
         df = pd.DataFrame(efficacy_benchmarks['overall_benchmarks'])
         if df.empty:
             return self._create_empty_figure("Efficacy Analysis", "No efficacy benchmark data available")
-        fig = go.Figure()
-        if 'line_of_therapy' in df and 'mean_orr' in df:
-            fig.add_trace(go.Bar(
-                x=df['line_of_therapy'],
-                y=df['mean_orr'],
-                name='Mean ORR',
-                marker_color=self._get_color('efficacy')
-            ))
-        if 'line_of_therapy' in df and 'mean_pfs' in df:
-            fig.add_trace(go.Bar(
-                x=df['line_of_therapy'],
-                y=df['mean_pfs'],
-                name='Mean PFS',
-                marker_color=self._get_color('primary')
-            ))
+        fig = go.Figure(data=self._line_of_therapy_bars(df, (
+            ('mean_orr', 'Mean ORR', 'efficacy'),
+            ('mean_pfs', 'Mean PFS', 'primary'),
+        )))
         fig.update_layout(
             title="Efficacy Benchmarks by Line of Therapy",
             barmode='group',
-            template=self.theme,
             xaxis_title="Line of Therapy",
             yaxis_title="Value"
         )
@@ -1164,25 +1461,13 @@ class AdvancedVisualizer:
         df = pd.DataFrame(safety_patterns['safety_by_line'])
         if df.empty:
             return self._create_empty_figure("Safety Analysis", "No safety pattern data available")
-        fig = go.Figure()
-        if 'line_of_therapy' in df and 'avg_completion_rate' in df:
-            fig.add_trace(go.Bar(
-                x=df['line_of_therapy'],
-                y=df['avg_completion_rate'],
-                name='Avg Completion Rate',
-                marker_color=self._get_color('success')
-            ))
-        if 'line_of_therapy' in df and 'death_rate_percentage' in df:
-            fig.add_trace(go.Bar(
-                x=df['line_of_therapy'],
-                y=df['death_rate_percentage'],
-                name='Death Rate (%)',
-                marker_color=self._get_color('danger')
-            ))
+        fig = go.Figure(data=self._line_of_therapy_bars(df, (
+            ('avg_completion_rate', 'Avg Completion Rate', 'success'),
+            ('death_rate_percentage', 'Death Rate (%)', 'danger'),
+        )))
         fig.update_layout(
             title="Safety Patterns by Line of Therapy",
             barmode='group',
-            template=self.theme,
             xaxis_title="Line of Therapy",
             yaxis_title="Percentage"
         )
@@ -24,6 +24,7 @@ class Settings(BaseSettings):
     # Database settings
     DATABASE_URL: str = "duckdb:///data/ascomind_plus.db"
     VECTOR_DB_PATH: str = "data/vector_store"
+    VECTOR_STORE_MIGRATE_LEGACY_IDS: bool = False  # Re-key session vectors stored without the session ID prefix
     
     # LLM Configuration
     PRIMARY_LLM: str = "claude-3-sonnet"
@@ -41,6 +42,9 @@ class Settings(BaseSettings):
     MIN_CONFIDENCE_THRESHOLD: float = 0.7
     VALIDATION_ENABLED: bool = True
     AUTO_CORRECTION_ENABLED: bool = True
+    PROTOCOL_SEMANTIC_CACHE_ENABLED: bool = True  # Reuse protocol recommendations for near-identical study sets
+    SKIP_LLM_FOR_SMALL_INPUTS: bool = False  # Template-only protocols for fewer than 10 studies
+    ASCOMIND_STRICT_UUID: bool = False  # Use uuid4 ids for error metadata instead of prefixed counters
     
     # Visualization settings
     CHART_THEME: str = "plotly_white"
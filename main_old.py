@@ -16,7 +16,7 @@ from agents.metadata_extractor import EnhancedMetadataExtractor, BatchExtractor
 from agents.analyzer import IntelligentAnalyzer
 from agents.visualizer import AdvancedVisualizer
 from agents.categorizer import SmartCategorizer, BatchCategorizer
-from agents.protocol_maker import ProtocolMaker
+from agents.protocol_maker import get_protocol_maker
 from agents.vector_store import IntelligentVectorStore
 from agents.ai_assistant import AdvancedAIAssistant
 from models.abstract_metadata import ComprehensiveAbstractMetadata
@@ -764,7 +764,7 @@ class ASCOmindApp:
         try:
             self.metadata_extractor = EnhancedMetadataExtractor()
             self.categorizer = SmartCategorizer()
-            self.protocol_maker = ProtocolMaker()
+            self.protocol_maker = get_protocol_maker()
         except Exception as e:
             st.warning(f"Core agents initialization delayed: {e}")
             self.metadata_extractor = None
@@ -3476,9 +3476,7 @@ class ASCOmindApp:
                         studies_with_categories.append(study_data)
                     
                     # Generate protocol
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    protocol = loop.run_until_complete(
+                    protocol = self.protocol_maker.run_sync(
                         self.protocol_maker.generate_analysis_protocol(
                             studies_with_categories,
                             analysis_objective,
@@ -1,6 +1,6 @@
 # models/abstract_metadata.py - COMPREHENSIVE SCHEMA
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any, Union
 from enum import Enum
 from datetime import datetime
@@ -119,6 +119,15 @@ class MMSubtype(str, Enum):
     TRANSPLANT_INELIGIBLE = "Transplant Ineligible"
     SMOLDERING = "Smoldering"
 
+# Shared by nested models that are never mutated after extraction: frozen
+# instances are not revalidated on copy and reject accidental writes
+IMMUTABLE_SECTION_CONFIG = ConfigDict(
+    extra='ignore',
+    frozen=True,
+    revalidate_instances='never',
+    validate_assignment=False
+)
+
 class StudyIdentification(BaseModel):
     """Study identification and metadata"""
     title: str = Field(description="Full study title")
@@ -262,6 +271,8 @@ class TreatmentHistory(BaseModel):
 
 class TreatmentRegimen(BaseModel):
     """Treatment regimen information"""
+    model_config = IMMUTABLE_SECTION_CONFIG
+    
     regimen_name: str = Field(description="Treatment regimen name/acronym")
     arm_designation: Optional[str] = Field(default=None, description="Treatment arm designation")
     is_novel_regimen: bool = Field(default=False, description="Whether this is a novel regimen")
@@ -280,6 +291,8 @@ class TreatmentRegimen(BaseModel):
 
 class EfficacyOutcomes(BaseModel):
     """Comprehensive efficacy results"""
+    model_config = IMMUTABLE_SECTION_CONFIG
+    
     # Response rates
     overall_response_rate: Optional[Dict[str, Any]] = Field(default=None, description="ORR with CI and p-value")
     complete_response_rate: Optional[Dict[str, Any]] = Field(default=None, description="CR rate")
@@ -312,6 +325,8 @@ class EfficacyOutcomes(BaseModel):
 
 class SafetyProfile(BaseModel):
     """Comprehensive safety and tolerability data"""
+    model_config = IMMUTABLE_SECTION_CONFIG
+    
     safety_population: Optional[int] = Field(default=None, description="Safety evaluable population")
     
     # Treatment exposure